@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     "whitenoise.runserver_nostatic",
     "django.contrib.staticfiles",
     "django.contrib.sites",
+    "django.contrib.postgres",
     "allauth",
     "allauth.account",
     "allauth.socialaccount.providers.google",
@@ -69,6 +70,22 @@ DATABASES = {
     "default": env.db(),
 }
 
+# Cache shared by every web and worker process, so the version counters that
+# invalidate cached catalog artifacts agree across machines.
+# The table is created by `python manage.py createcachetable` on release.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+        # Room for the per-bib availability entries next to every category's
+        # version key and cached artifacts, so they don't cull each other
+        "OPTIONS": {
+            "MAX_ENTRIES": 50000,
+            "CULL_FREQUENCY": 10,  # Drop a tenth of the entries when full
+        },
+    }
+}
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
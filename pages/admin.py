@@ -3,8 +3,8 @@ from import_export.admin import ImportExportModelAdmin
 
 # Register your models here.
 from .models import (Author, AwardLevel, Book, BookCategory, Category,
-                     Illustrator, Library, UserBook, UserBookCategory,
-                     WebPlatform)
+                     Illustrator, ImportJob, Library, UserBook,
+                     UserListProgress, WebPlatform)
 from .resources import (AuthorResource, BookCategoryResource, BookResource,
                         CategoryResource, LibraryResource)
 
@@ -63,6 +63,13 @@ class UserBookAdmin(admin.ModelAdmin):
     list_display = ("id","user", "book", "completed")
 
 
-@admin.register(UserBookCategory)
-class UserBookCategoryAdmin(admin.ModelAdmin):
-    list_display = ("id","user", "book_category", "completed")
+@admin.register(UserListProgress)
+class UserListProgressAdmin(admin.ModelAdmin):
+    list_display = ("id","user", "category", "year", "completed_count", "total_books", "pages_read")
+    list_filter = ("category", "year")
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "original_filename", "user", "status", "processed_rows", "error_count", "attempts", "created_at")
+    list_filter = ("status",)
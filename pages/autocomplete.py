@@ -0,0 +1,115 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from .catalog import get_versioned
+from .models import Author, Book, Illustrator
+from .normalization import normalize_search_key
+
+SEARCH_VERSION_KEY = "search_version"
+SUGGESTION_LIMIT = 5
+
+
+@dataclass(frozen=True)
+class PersonSuggestion:
+    id: int
+    name: str
+
+    def __str__(self):
+        return self.name
+
+
+@dataclass(frozen=True)
+class BookSuggestion:
+    slug: str
+    title: str
+    author: PersonSuggestion
+
+    def __str__(self):
+        return self.title
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index over normalized names.
+
+    Every word of a name is a starting point, so "dicamillo" and "kate" both
+    find "Kate DiCamillo". Lookups bisect to the first key with the prefix and
+    walk forward until the prefix no longer matches.
+    """
+
+    def __init__(self, entries):
+        keys = []
+        self.items = []
+        for text, item in entries:
+            words = normalize_search_key(text).split()
+            position = len(self.items)
+            self.items.append(item)
+            for start in range(len(words)):
+                keys.append((" ".join(words[start:]), position))
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.positions = [position for _, position in keys]
+
+    def search(self, query, limit=SUGGESTION_LIMIT):
+        """Return up to `limit` items with a word starting with the query"""
+        prefix = normalize_search_key(query)
+        if not prefix:
+            return []
+
+        found = []
+        seen = set()
+        for i in range(bisect_left(self.keys, prefix), len(self.keys)):
+            if not self.keys[i].startswith(prefix):
+                break
+            position = self.positions[i]
+            if position not in seen:
+                seen.add(position)
+                found.append(self.items[position])
+                if len(found) == limit:
+                    break
+        return found
+
+
+class AutocompleteIndex:
+    """Prefix indexes for authors, illustrators and book titles"""
+
+    def __init__(self, authors, illustrators, books):
+        self.authors = PrefixIndex(authors)
+        self.illustrators = PrefixIndex(illustrators)
+        self.books = PrefixIndex(books)
+
+    @classmethod
+    def build(cls):
+        authors = {
+            author.id: PersonSuggestion(author.id, author.full_name)
+            for author in Author.objects.only("id", "first_name", "last_name")
+        }
+        illustrators = (
+            PersonSuggestion(illustrator.id, illustrator.full_name)
+            for illustrator in Illustrator.objects.only("id", "first_name", "last_name")
+        )
+        books = (
+            (title, BookSuggestion(slug, title, authors[author_id]))
+            for title, slug, author_id in Book.objects.values_list(
+                "title", "slug", "author_id"
+            )
+        )
+        return cls(
+            ((author.name, author) for author in authors.values()),
+            ((illustrator.name, illustrator) for illustrator in illustrators),
+            books,
+        )
+
+    def suggest(self, query, limit=SUGGESTION_LIMIT):
+        return {
+            "authors": self.authors.search(query, limit),
+            "illustrators": self.illustrators.search(query, limit),
+            "books": self.books.search(query, limit),
+        }
+
+
+def get_autocomplete_index():
+    """Return the autocomplete index, rebuilt only when books or people change"""
+    return get_versioned(
+        "autocomplete_index", AutocompleteIndex.build, version_key=SEARCH_VERSION_KEY
+    )
@@ -0,0 +1,224 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GATEWAY_URL = "https://gateway.bibliocommons.com/v2/libraries"
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_REQUEST_TIMEOUT = 5  # Seconds allowed for each availability call
+DEFAULT_TOTAL_TIMEOUT = 15  # Seconds allowed for a whole batch
+DEFAULT_CACHE_TTL = 300  # Availability is fresh for 5 minutes
+DEFAULT_STALE_TTL = 3600  # ...then served stale for up to an hour while it refreshes
+DEFAULT_NEGATIVE_TTL = 3600  # Bibs the gateway doesn't know are rechecked hourly
+
+
+def parse_available_items(data):
+    """
+    Extract the available copies from a Bibliocommons availability response.
+
+    Returns a list of dicts with branchName, collection and callNumber.
+    """
+    items = []
+    for item_data in data.get("entities", {}).get("bibItems", {}).values():
+        availability = item_data.get("availability", {})
+        if availability.get("statusType") == "AVAILABLE":
+            items.append(
+                {
+                    "branchName": item_data.get("branchName", "Unknown"),
+                    "collection": item_data.get("collection", "Unknown Collection"),
+                    "callNumber": item_data.get("callNumber", "Unknown Call Number"),
+                }
+            )
+    return items
+
+
+class BibliocommonsAvailabilityClient:
+    """
+    Fetch branch availability for many bibs concurrently over pooled connections.
+
+    Results are cached per (library, bib). Fresh entries are served directly,
+    stale ones are served while a background refresh runs, and 404s are cached
+    as negative entries so unknown bibs don't hit the gateway on every view.
+    """
+
+    def __init__(
+        self,
+        gateway_url=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+        request_timeout=DEFAULT_REQUEST_TIMEOUT,
+        total_timeout=DEFAULT_TOTAL_TIMEOUT,
+        cache_ttl=None,
+        stale_ttl=None,
+        negative_ttl=None,
+    ):
+        self.gateway_url = (
+            gateway_url
+            or getattr(settings, "BIBLIOCOMMONS_GATEWAY_URL", None)
+            or DEFAULT_GATEWAY_URL
+        ).rstrip("/")
+        self.max_workers = max_workers
+        self.request_timeout = request_timeout
+        self.total_timeout = total_timeout
+        self.cache_ttl = (
+            cache_ttl
+            if cache_ttl is not None
+            else getattr(settings, "AVAILABILITY_CACHE_TTL", DEFAULT_CACHE_TTL)
+        )
+        self.stale_ttl = (
+            stale_ttl
+            if stale_ttl is not None
+            else getattr(settings, "AVAILABILITY_STALE_TTL", DEFAULT_STALE_TTL)
+        )
+        self.negative_ttl = (
+            negative_ttl
+            if negative_ttl is not None
+            else getattr(settings, "AVAILABILITY_NEGATIVE_TTL", DEFAULT_NEGATIVE_TTL)
+        )
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2)
+
+        # One keep-alive connection per worker, reused across requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def availability_url(self, library_id, bib_id):
+        #example url: https://gateway.bibliocommons.com/v2/libraries/hclib/bibs/S109C5966261/availability?locale=en-US
+        return f"{self.gateway_url}/{library_id}/bibs/{bib_id}/availability"
+
+    def fetch_one(self, library_id, bib_id):
+        """Return the available items for one bib, raising on HTTP or network errors"""
+        response = self.session.get(
+            self.availability_url(library_id, bib_id),
+            params={"locale": "en-US"},
+            timeout=self.request_timeout,
+        )
+        response.raise_for_status()
+        return parse_available_items(response.json())
+
+    def cache_key(self, library_id, bib_id):
+        return f"availability:{library_id}:{bib_id}"
+
+    def _store(self, library_id, bib_id, items, ttl):
+        """Cache items (None for a 404) for ttl seconds, plus the stale window"""
+        cache.set(
+            self.cache_key(library_id, bib_id),
+            {"items": items, "fetched_at": time.time(), "ttl": ttl},
+            ttl + self.stale_ttl,
+        )
+
+    def fetch_many(self, library_id, bib_ids):
+        """
+        Fetch availability for many bibs at once.
+
+        Returns a dict of bib_id -> available items. Bibs that fail, are
+        unknown to the gateway or do not answer within the batch timeout are
+        left out, so callers always get whatever partial results are available.
+        """
+        bib_ids = list(dict.fromkeys(bib_id for bib_id in bib_ids if bib_id))
+        results = {}
+        if not bib_ids:
+            return results
+
+        cached = cache.get_many([self.cache_key(library_id, bib_id) for bib_id in bib_ids])
+        now = time.time()
+        missing = []
+        stale = []
+        for bib_id in bib_ids:
+            entry = cached.get(self.cache_key(library_id, bib_id))
+            if entry is None:
+                missing.append(bib_id)
+                continue
+            if entry["items"] is not None:
+                results[bib_id] = entry["items"]
+            if now - entry["fetched_at"] > entry["ttl"]:
+                stale.append(bib_id)
+
+        if stale:
+            self._refresh_in_background(library_id, stale)
+        if missing:
+            results.update(self._fetch_batch(library_id, missing))
+        return results
+
+    def _refresh_in_background(self, library_id, bib_ids):
+        # Only one worker refreshes a given bib at a time
+        bib_ids = [
+            bib_id
+            for bib_id in bib_ids
+            if cache.add(
+                f"{self.cache_key(library_id, bib_id)}:refreshing",
+                True,
+                self.total_timeout,
+            )
+        ]
+        if bib_ids:
+            self._refresh_executor.submit(self._refresh, library_id, bib_ids)
+
+    def _refresh(self, library_id, bib_ids):
+        # The cache backend may be the database; this thread's connection is
+        # closed when it is done rather than left open between refreshes
+        close_old_connections()
+        try:
+            self._fetch_batch(library_id, bib_ids)
+        finally:
+            connection.close()
+
+    def _fetch_batch(self, library_id, bib_ids):
+        """Fetch bibs from the gateway concurrently and cache what comes back"""
+        results = {}
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(bib_ids)))
+        futures = {
+            executor.submit(self.fetch_one, library_id, bib_id): bib_id
+            for bib_id in bib_ids
+        }
+        try:
+            for future in as_completed(futures, timeout=self.total_timeout):
+                bib_id = futures[future]
+                try:
+                    results[bib_id] = future.result()
+                    self._store(library_id, bib_id, results[bib_id], self.cache_ttl)
+                except requests.HTTPError as e:
+                    if e.response is not None and e.response.status_code == 404:
+                        self._store(library_id, bib_id, None, self.negative_ttl)
+                    else:
+                        logger.warning(
+                            "Error fetching availability for %s/%s: %s",
+                            library_id,
+                            bib_id,
+                            e,
+                        )
+                except Exception as e:
+                    logger.warning(
+                        "Error fetching availability for %s/%s: %s", library_id, bib_id, e
+                    )
+        except TimeoutError:
+            logger.warning(
+                "Availability batch for %s timed out with %d of %d bibs fetched",
+                library_id,
+                len(results),
+                len(bib_ids),
+            )
+        finally:
+            # Don't hold the web worker for stragglers; their results are dropped
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return results
+
+
+_client = None
+
+
+def get_availability_client():
+    """Return the process-wide client, so its connection pool is shared"""
+    global _client
+    if _client is None:
+        _client = BibliocommonsAvailabilityClient()
+    return _client
@@ -0,0 +1,207 @@
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Book, BookCategory, Category
+
+CATALOG_VERSION_KEY = "catalog_version"
+HOMEPAGE_VERSION_KEY = "homepage_version"
+CATALOG_CACHE_TIMEOUT = 3600  # Rebuild at least hourly, even without a version bump
+
+# Per-process copies of the cached artifacts, so a warm worker does not need to
+# unpickle the whole index from the cache backend on every request.
+_local_artifacts = {}
+
+
+def get_version(version_key=CATALOG_VERSION_KEY):
+    """Return the current value of a version counter, initialising it if needed"""
+    version = cache.get(version_key)
+    if version is None:
+        # Start from a timestamp so a lost key never reuses an old version
+        cache.add(version_key, time.time_ns(), CATALOG_CACHE_TIMEOUT)
+        version = cache.get(version_key)
+    return version
+
+
+def bump_version(version_key=CATALOG_VERSION_KEY):
+    """Invalidate every artifact built against a version counter"""
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, time.time_ns(), CATALOG_CACHE_TIMEOUT)
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalidate every artifact derived from the award catalog"""
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def get_versioned(name, builder, version_key=CATALOG_VERSION_KEY):
+    """
+    Return the artifact called `name` for the current version of `version_key`.
+
+    Looks in the per-process copy first, then the shared cache, and only calls
+    `builder()` when neither holds an artifact for the current version.
+    """
+    version = get_version(version_key)
+    local = _local_artifacts.get(name)
+    if local is not None and local[0] == version:
+        return local[1]
+
+    cache_key = f"{version_key}:{name}:{version}"
+    artifact = cache.get(cache_key)
+    if artifact is None:
+        artifact = builder()
+        cache.set(cache_key, artifact, CATALOG_CACHE_TIMEOUT)
+
+    _local_artifacts[name] = (version, artifact)
+    return artifact
+
+
+class MembershipIndex:
+    """
+    Inverted index of award list membership.
+
+    lists_by_book maps a book id to the (category_id, year) lists it appears on,
+    list_sizes maps each list to its number of books, and categories maps a
+    category id to its (name, slug).
+    """
+
+    def __init__(self, memberships, categories):
+        lists_by_book = defaultdict(list)
+        list_sizes = defaultdict(int)
+        for book_id, category_id, year in memberships:
+            award_list = (category_id, year)
+            lists_by_book[book_id].append(award_list)
+            list_sizes[award_list] += 1
+
+        self.lists_by_book = {
+            book_id: tuple(lists) for book_id, lists in lists_by_book.items()
+        }
+        self.list_sizes = dict(list_sizes)
+        self.categories = dict(categories)
+
+    @classmethod
+    def build(cls):
+        memberships = BookCategory.objects.values_list("book_id", "category_id", "year")
+        categories = (
+            (category_id, (name, slug))
+            for category_id, name, slug in Category.objects.values_list(
+                "id", "name", "slug"
+            )
+        )
+        return cls(memberships, categories)
+
+    def lists_for_books(self, book_ids):
+        """Yield every (category_id, year) list for each of the given books"""
+        lists_by_book = self.lists_by_book
+        for book_id in book_ids:
+            yield from lists_by_book.get(book_id, ())
+
+
+def get_membership_index():
+    """Return the cached membership index for the current catalog version"""
+    return get_versioned("membership_index", MembershipIndex.build)
+
+
+def build_homepage_categories():
+    """
+    The name, slug and description of every category, for the homepage list.
+
+    Only the fields the template shows are kept, so the snapshot stays small
+    and does not depend on the memberships.
+    """
+    return list(Category.objects.values("name", "slug", "description"))
+
+
+def get_homepage_categories():
+    """Homepage category snapshot, rebuilt only when a category changes"""
+    return get_versioned(
+        "homepage_categories", build_homepage_categories, version_key=HOMEPAGE_VERSION_KEY
+    )
+
+
+def build_award_year_index():
+    """
+    Every award list, grouped by category name.
+
+    Returns a dict of category name -> (slug, [award, ...]) where each award
+    is a dict with the category id and slug, year and book_count, newest year
+    first. Built from one grouped query over the memberships.
+    """
+    award_years = defaultdict(list)
+    slugs = {}
+    for award in (
+        BookCategory.objects.values(
+            "category", "category__name", "category__slug", "year"
+        )
+        .annotate(book_count=Count("id"))
+        .order_by("category__name", "-year")
+    ):
+        award_years[award["category__name"]].append(award)
+        slugs[award["category__name"]] = award["category__slug"]
+
+    return {name: (slugs[name], awards) for name, awards in award_years.items()}
+
+
+def get_award_year_index():
+    """Award list index, rebuilt only when memberships or categories change"""
+    return get_versioned("award_year_index", build_award_year_index)
+
+
+def most_completed_books(books_to_list):
+    """
+    The books completed by the most readers.
+
+    Reads the completion_count counters kept by pages.progress, so this is a
+    short scan of the (completion_count, title) index rather than an aggregate
+    over every UserBook.
+    """
+    return list(
+        Book.objects.filter(completion_count__gt=0)
+        .select_related("author")
+        .order_by("-completion_count", "title")[:books_to_list]
+    )
+
+
+def category_version_key(category_id):
+    return f"category_version:{category_id}"
+
+
+def bump_category_versions(category_ids):
+    """Invalidate the cached detail pages of the given categories"""
+    for category_id in set(category_ids):
+        bump_version(category_version_key(category_id))
+
+
+def get_category_years(category):
+    """
+    A category's memberships grouped by year, newest first.
+
+    This grouping is the same for every visitor, so it is cached per category
+    and versioned on that category alone. Returns a list of
+    (year, [book_category, ...]) pairs.
+    """
+
+    def build():
+        books_by_year = defaultdict(list)
+        memberships = (
+            BookCategory.objects.filter(category=category)
+            .select_related("book", "book__author", "award_level")
+            .order_by("-year", "award_level")
+        )
+        for book_category in memberships:
+            books_by_year[book_category.year].append(book_category)
+        return list(books_by_year.items())
+
+    return get_versioned(
+        f"category_years_{category.id}",
+        build,
+        version_key=category_version_key(category.id),
+    )
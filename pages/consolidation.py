@@ -0,0 +1,150 @@
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import Count
+
+from .autocomplete import SEARCH_VERSION_KEY
+from .catalog import bump_category_versions, get_versioned
+from .models import Author, Book, BookCategory, Illustrator
+from .search import update_search_documents
+
+SIMILARITY_THRESHOLD = 0.85
+MAX_BLOCK_SIZE = 500  # Blocks larger than this are too generic to compare pairwise
+
+# The Book foreign key each kind of person is linked by
+BOOK_FIELDS = {Author: "author", Illustrator: "illustrator"}
+
+
+@transaction.atomic
+def merge_people(model, primary, duplicates):
+    """
+    Merge duplicate Authors or Illustrators into `primary`.
+
+    Every book of the duplicates is moved with a single UPDATE, then the
+    duplicates are deleted. Returns the number of books moved.
+    """
+    duplicate_ids = [person.pk for person in duplicates if person.pk != primary.pk]
+    book_field = BOOK_FIELDS[model]
+    books = Book.objects.filter(**{f"{book_field}_id__in": duplicate_ids})
+    book_ids = list(books.values_list("id", flat=True))
+
+    moved = Book.objects.filter(id__in=book_ids).update(**{book_field: primary})
+    model.objects.filter(pk__in=duplicate_ids).delete()
+
+    # QuerySet.update() skips the save signals, so refresh what they would have
+    bump_category_versions(
+        BookCategory.objects.filter(book_id__in=book_ids).values_list("category_id", flat=True)
+    )
+    transaction.on_commit(lambda: update_search_documents(book_ids))
+    return moved
+
+
+class _DisjointSet:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        if parent != item:
+            parent = self.parent[item] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+
+def _blocking_keys(first_name, last_name):
+    """
+    Keys that likely duplicates share.
+
+    Comparing only people within a block keeps the pass near linear: a typo in
+    the first name still shares the last-name block, a typo in the last name
+    shares the first-name block, and swapped names share the sorted-token key.
+    """
+    yield ("last", last_name[:4], first_name[:1])
+    yield ("first", first_name[:4], last_name[:1])
+    yield ("tokens", " ".join(sorted(f"{first_name} {last_name}".split())))
+
+
+def duplicate_clusters(people, threshold=SIMILARITY_THRESHOLD):
+    """
+    Group likely duplicate people.
+
+    `people` is an iterable of (id, first_name_normalized, last_name_normalized).
+    People sharing a blocking key are compared by sequence similarity of their
+    full normalized names. Returns clusters of two or more ids, each sorted,
+    largest clusters first.
+    """
+    names = {}
+    blocks = defaultdict(list)
+    for person_id, first_name, last_name in people:
+        if not (first_name or last_name):
+            continue
+        names[person_id] = f"{first_name} {last_name}".strip()
+        for key in _blocking_keys(first_name, last_name):
+            blocks[key].append(person_id)
+
+    clusters = _DisjointSet()
+    matcher = SequenceMatcher(autojunk=False)
+    for key, members in blocks.items():
+        if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+            continue
+        if key[0] == "tokens":
+            # Same words in any order is a duplicate outright
+            for person_id in members[1:]:
+                clusters.union(members[0], person_id)
+            continue
+
+        for i, person_id in enumerate(members):
+            name = names[person_id]
+            matcher.set_seq2(name)
+            for other_id in members[i + 1:]:
+                if clusters.find(person_id) == clusters.find(other_id):
+                    continue
+                matcher.set_seq1(names[other_id])
+                if (
+                    matcher.real_quick_ratio() >= threshold
+                    and matcher.quick_ratio() >= threshold
+                    and matcher.ratio() >= threshold
+                ):
+                    clusters.union(person_id, other_id)
+
+    grouped = defaultdict(list)
+    for person_id in clusters.parent:
+        grouped[clusters.find(person_id)].append(person_id)
+
+    return sorted(
+        (sorted(members) for members in grouped.values() if len(members) > 1),
+        key=lambda members: (-len(members), members[0]),
+    )
+
+
+def find_duplicate_clusters(model, threshold=SIMILARITY_THRESHOLD):
+    """Duplicate clusters of Authors or Illustrators, cached until people change"""
+
+    def build():
+        return duplicate_clusters(
+            model.objects.values_list("id", "first_name_normalized", "last_name_normalized")
+            .iterator(),
+            threshold,
+        )
+
+    return get_versioned(
+        f"duplicate_clusters_{model._meta.model_name}_{threshold}",
+        build,
+        version_key=SEARCH_VERSION_KEY,
+    )
+
+
+def load_duplicate_clusters(model, threshold=SIMILARITY_THRESHOLD):
+    """The duplicate clusters as lists of people annotated with book_count"""
+    clusters = find_duplicate_clusters(model, threshold)
+    people = model.objects.filter(
+        id__in=[person_id for cluster in clusters for person_id in cluster]
+    ).annotate(book_count=Count("books")).in_bulk()
+    loaded = (
+        [people[person_id] for person_id in cluster if person_id in people]
+        for cluster in clusters
+    )
+    return [cluster for cluster in loaded if len(cluster) > 1]
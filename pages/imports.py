@@ -0,0 +1,132 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ImportJob, ImportRowError
+from .staging import CatalogLookup, import_rows
+from .upload_utils import UploadFormatError, UploadReader
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+STALE_AFTER = timedelta(minutes=10)  # Running jobs without progress this long are retried
+MAX_ATTEMPTS = 3  # A job that keeps killing its worker is failed instead of retried
+
+
+def enqueue_import(uploaded_file, user=None):
+    """Store an uploaded TSV and queue it for the worker, returning the job"""
+    return ImportJob.objects.create(
+        user=user,
+        file=uploaded_file,
+        original_filename=uploaded_file.name[:255],
+    )
+
+
+def claim_next_job():
+    """
+    Take the oldest queued job, marking it running.
+
+    Rows are locked with SKIP LOCKED where supported, so several workers can
+    poll the same table without taking the same job.
+    """
+    now = timezone.now()
+    # A worker that died mid-job leaves it running with a stale heartbeat
+    stale = ImportJob.objects.filter(status=ImportJob.RUNNING, heartbeat_at__lt=now - STALE_AFTER)
+    stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ImportJob.FAILED,
+        finished_at=now,
+        errors=[f"The worker stopped responding on each of {MAX_ATTEMPTS} attempts"],
+    )
+    stale.filter(attempts__lt=MAX_ATTEMPTS).update(status=ImportJob.QUEUED)
+
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImportJob.QUEUED)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = ImportJob.RUNNING
+        job.started_at = job.heartbeat_at = now
+        job.attempts += 1
+        job.processed_rows = job.error_count = job.processed_bytes = 0
+        job.errors = []
+        job.row_errors.all().delete()
+        job.save(
+            update_fields=[
+                "status", "started_at", "heartbeat_at", "attempts", "processed_rows",
+                "error_count", "processed_bytes", "errors",
+            ]
+        )
+    return job
+
+
+def _record_progress(job, rows, errors, bytes_read):
+    ImportRowError.objects.bulk_create(
+        ImportRowError(job=job, row=error.row, column=error.column, reason=error.reason[:255])
+        for error in errors
+    )
+    ImportJob.objects.filter(pk=job.pk).update(
+        processed_rows=F("processed_rows") + rows,
+        error_count=F("error_count") + len(errors),
+        processed_bytes=bytes_read,
+        heartbeat_at=timezone.now(),
+    )
+
+
+def _finish(job, status, errors=None):
+    job.refresh_from_db(fields=["processed_rows", "error_count", "processed_bytes"])
+    job.status = status
+    job.finished_at = timezone.now()
+    update_fields = ["status", "finished_at"]
+    if errors is not None:
+        job.errors = errors
+        update_fields.append("errors")
+    job.save(update_fields=update_fields)
+
+
+def run_import_job(job):
+    """
+    Import a claimed job's file, recording progress per batch.
+
+    The file is streamed once: rows are validated as they are read and fed
+    to the importer in batches, and rows that fail validation are recorded
+    as ImportRowErrors and skipped.
+    """
+    try:
+        job.total_bytes = job.file.size
+        job.save(update_fields=["total_bytes"])
+
+        with job.file.open("rb") as upload:
+            reader = UploadReader(upload)
+            reader.check_header()
+            lookup = CatalogLookup.build()
+            total_rows = 0
+            for batch in reader.batches(BATCH_SIZE):
+                total_rows += len(batch)
+                errors = [error for _, _, row_errors in batch for error in row_errors]
+                _, import_errors = import_rows(
+                    ((row_num, row) for row_num, row, row_errors in batch if not row_errors),
+                    lookup,
+                )
+                _record_progress(job, len(batch), errors + import_errors, reader.bytes_read)
+    except UploadFormatError as e:
+        _finish(job, ImportJob.FAILED, [str(e)])
+        return job
+    except Exception as e:
+        logger.exception("Import job %s failed", job.pk)
+        _finish(job, ImportJob.FAILED, job.errors + [f"Error processing file: {e}"])
+        return job
+
+    job.total_rows = total_rows
+    job.save(update_fields=["total_rows"])
+    if not total_rows:
+        _finish(job, ImportJob.FAILED, ["File contains no data rows"])
+    else:
+        _finish(job, ImportJob.SUCCEEDED)
+    return job
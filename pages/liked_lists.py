@@ -0,0 +1,87 @@
+from collections import defaultdict
+
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Lower
+
+from .models import AwardYearLike, Book, BookCategory, UserBook
+from .progress import book_completed_by
+
+
+def liked_memberships(user):
+    """
+    BookCategory rows on every (category, year) list the user has liked.
+
+    The likes are matched with a correlated EXISTS, so all liked lists are
+    loaded in a single query regardless of how many the user follows.
+    """
+    liked = AwardYearLike.objects.filter(
+        user=user, category=OuterRef("category"), year=OuterRef("year")
+    )
+    return BookCategory.objects.filter(Exists(liked)).select_related(
+        "category", "book", "book__author", "award_level"
+    )
+
+
+def group_liked_memberships(user):
+    """
+    Load the user's liked lists and group them in Python.
+
+    Returns {category: {year: [book_category, ...]}}, with categories sorted by
+    name, years newest first and books by title.
+    """
+    grouped = defaultdict(lambda: defaultdict(list))
+    memberships = liked_memberships(user).order_by(
+        "category__name", "category_id", "-year", "book__title"
+    )
+    for book_category in memberships:
+        grouped[book_category.category][book_category.year].append(book_category)
+
+    return {category: dict(years) for category, years in grouped.items()}
+
+
+def liked_lists_with_completion(user):
+    """
+    The user's liked lists with their books split by completion.
+
+    Uses one query for the likes and one for every membership on them, with the
+    user's completion annotated per row. Returns a list of
+    (like, completed_book_categories, not_completed_book_categories) tuples in
+    the likes' default order.
+    """
+    memberships = (
+        liked_memberships(user)
+        .annotate(is_completed=book_completed_by(user))
+        .order_by("book__title")
+    )
+
+    books_by_list = defaultdict(lambda: ([], []))
+    for book_category in memberships:
+        completed_books, not_completed_books = books_by_list[
+            (book_category.category_id, book_category.year)
+        ]
+        if book_category.is_completed:
+            completed_books.append(book_category)
+        else:
+            not_completed_books.append(book_category)
+
+    likes = AwardYearLike.objects.filter(user=user).select_related("category")
+    return [
+        (like, *books_by_list[(like.category_id, like.year)]) for like in likes
+    ]
+
+
+def to_read_books(user):
+    """
+    Books on any of the user's liked lists that they haven't completed yet.
+
+    Each book appears once even when it is on several liked lists, and the
+    result is sorted by author last name in the database.
+    """
+    on_liked_list = liked_memberships(user).filter(book=OuterRef("pk"))
+    completed = UserBook.objects.filter(user=user, book=OuterRef("pk"), completed=True)
+    return (
+        Book.objects.filter(Exists(on_liked_list))
+        .exclude(Exists(completed))
+        .select_related("author")
+        .order_by(Lower("author__last_name"), "title")
+    )
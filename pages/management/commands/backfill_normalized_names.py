@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from pages.models import Author, Book, Illustrator
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Fill the accent-insensitive *_normalized columns on authors, illustrators and books'
+
+    def handle(self, *args, **options):
+        for model in (Author, Illustrator, Book):
+            batch = []
+            updated = 0
+            for obj in model.objects.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+                batch.append(obj)
+                if len(batch) == BATCH_SIZE:
+                    updated += self.save_batch(model, batch)
+                    batch = []
+            if batch:
+                updated += self.save_batch(model, batch)
+
+            self.stdout.write(
+                self.style.SUCCESS(f"Normalized {updated} {model._meta.verbose_name_plural}")
+            )
+
+    def save_batch(self, model, batch):
+        # bulk_update recomputes the normalized values before writing them
+        return model.objects.bulk_update(batch, model.normalized_fields)
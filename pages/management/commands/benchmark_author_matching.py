@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pages.models import Author
+from pages.normalization import normalize_text_advanced
+from pages.upload_utils import find_author_flexible
+
+FIRST_NAMES = ['José', 'Zoë', 'Renée', 'Søren', 'Ana', 'Kate', 'Matt', 'Chloé', 'Ömer', 'Lin']
+LAST_NAMES = ['Peña', 'Brontë', 'Núñez', 'García', 'DiCamillo', 'Müller', 'Ødegaard', 'Smith']
+
+
+def scan_authors(first_name, last_name):
+    """The previous fallback: normalize every author in Python until one matches"""
+    first_normalized = normalize_text_advanced(first_name)
+    last_normalized = normalize_text_advanced(last_name)
+    for candidate in Author.objects.all():
+        if (normalize_text_advanced(candidate.first_name) == first_normalized and
+                normalize_text_advanced(candidate.last_name) == last_normalized):
+            return candidate
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Time flexible author matching against a synthetic catalog. '
+        'Runs inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=50000)
+        parser.add_argument('--lookups', type=int, default=200)
+        parser.add_argument(
+            '--scan-lookups',
+            type=int,
+            default=5,
+            help='Lookups to time with the old full-table scan (it is slow)'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(12)
+        with transaction.atomic():
+            started = time.perf_counter()
+            Author.objects.bulk_create(
+                [
+                    Author(
+                        first_name=f"{rng.choice(FIRST_NAMES)}{number}",
+                        last_name=rng.choice(LAST_NAMES),
+                    )
+                    for number in range(options['authors'])
+                ],
+                batch_size=1000,
+            )
+            self.stdout.write(
+                f"Created {options['authors']} authors in {time.perf_counter() - started:.1f}s"
+            )
+
+            # Accent-stripped, upper-cased spellings so the exact match misses
+            names = list(Author.objects.values_list('first_name_normalized', 'last_name_normalized'))
+            queries = [
+                (first.upper(), last.upper()) for first, last in rng.sample(names, options['lookups'])
+            ]
+
+            started = time.perf_counter()
+            for first_name, last_name in queries:
+                author, _, _ = find_author_flexible(first_name, last_name)
+                assert author is not None
+            indexed = (time.perf_counter() - started) / len(queries)
+
+            started = time.perf_counter()
+            for first_name, last_name in queries[:options['scan_lookups']]:
+                scan_authors(first_name, last_name)
+            scanned = (time.perf_counter() - started) / max(options['scan_lookups'], 1)
+
+            self.stdout.write(f"Indexed lookup: {indexed * 1000:.2f} ms per row")
+            self.stdout.write(f"Full scan:      {scanned * 1000:.2f} ms per row")
+            self.stdout.write(self.style.SUCCESS(f"Speedup: {scanned / indexed:.0f}x"))
+
+            transaction.set_rollback(True)
@@ -1,9 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 from pages.models import Book  # Replace with your actual app name
-from pages.services import AmazonBookMatcher, BookDataEnricher  # Replace with your app name
+from pages.services import DEFAULT_MAX_WORKERS, BookEnrichmentPipeline  # Replace with your app name
 from django.conf import settings
-import time
 
 
 class Command(BaseCommand):
@@ -17,10 +16,16 @@ class Command(BaseCommand):
             help='Maximum number of books to process (default: 50)'
         )
         parser.add_argument(
-            '--delay',
+            '--workers',
+            type=int,
+            default=DEFAULT_MAX_WORKERS,
+            help=f'Books processed concurrently (default: {DEFAULT_MAX_WORKERS})'
+        )
+        parser.add_argument(
+            '--rate',
             type=float,
-            default=1.0,
-            help='Delay between API calls in seconds (default: 1.0)'
+            default=None,
+            help='ASIN Data API calls per second (default: ASINDATAAPI_REQUESTS_PER_SECOND setting)'
         )
         parser.add_argument(
             '--dry-run',
@@ -37,10 +42,6 @@ class Command(BaseCommand):
             )
             return
 
-        # Initialize services
-        amazon_matcher = AmazonBookMatcher(api_key)
-        enricher = BookDataEnricher(amazon_matcher)
-
         # Get books with missing fields
         books_query = Book.objects.filter(
             Q(asin__isnull=True) | Q(asin="") |
@@ -50,7 +51,6 @@ class Command(BaseCommand):
 
         total_books = books_query.count()
         limit = options['limit']
-        delay = options['delay']
         dry_run = options['dry_run']
 
         self.stdout.write(f"Found {total_books} books with missing data")
@@ -58,32 +58,21 @@ class Command(BaseCommand):
 
         if dry_run:
             self.stdout.write(self.style.WARNING("DRY RUN - No changes will be made"))
-
-        processed = 0
-        updated = 0
-
-        for book in books_query[:limit]:
-            processed += 1
-
-            if dry_run:
+            processed = 0
+            for book in books_query[:limit]:
+                processed += 1
                 print(f"[{processed}/{limit}] Would process: '{book.title}' by {book.author}")
-            else:
-                print(f"[{processed}/{limit}] Processing: '{book.title}' by {book.author}")
-                try:
-                    if enricher.enrich_book(book):
-                        updated += 1
-                except Exception as e:
-                    print(f"  Error processing book: {e}")
+            self.stdout.write(f"Would process {processed} books")
+            return
 
-                # Rate limiting
-                if delay > 0:
-                    time.sleep(delay)
+        pipeline = BookEnrichmentPipeline.from_settings(
+            max_workers=options['workers'], requests_per_second=options['rate']
+        )
+        counts = pipeline.run(books_query[:limit])
 
-        if not dry_run:
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"Completed! Processed {processed} books, updated {updated}"
-                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Completed! Processed {counts['processed']} books, updated {counts['updated']}, "
+                f"{counts['errors']} errors"
             )
-        else:
-            self.stdout.write(f"Would process {processed} books")
+        )
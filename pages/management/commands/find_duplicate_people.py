@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pages.consolidation import SIMILARITY_THRESHOLD, duplicate_clusters
+from pages.models import Author, Illustrator
+
+
+class Command(BaseCommand):
+    help = 'List clusters of likely duplicate authors or illustrators'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['authors', 'illustrators'], default='authors')
+        parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD)
+
+    def handle(self, *args, **options):
+        model = Author if options['kind'] == 'authors' else Illustrator
+        people = list(
+            model.objects.values_list('id', 'first_name_normalized', 'last_name_normalized')
+        )
+
+        started = time.perf_counter()
+        clusters = duplicate_clusters(people, options['threshold'])
+        elapsed = time.perf_counter() - started
+
+        names = dict(
+            (person_id, f"{first_name} {last_name}") for person_id, first_name, last_name in people
+        )
+        for cluster in clusters:
+            self.stdout.write(", ".join(f"{names[person_id]} ({person_id})" for person_id in cluster))
+        self.stdout.write(self.style.SUCCESS(
+            f"Found {len(clusters)} clusters among {len(people)} {options['kind']} in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from pages.progress import rebuild_user_progress
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user award list progress table from UserBook'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Only rebuild progress for the given username (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(
+                get_user_model().objects.filter(
+                    username__in=options['usernames']
+                ).values_list('id', flat=True)
+            )
+
+        rows = rebuild_user_progress(user_ids=user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} list progress rows"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from pages.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the book search documents used by the search page'
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} books"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from pages.progress import reconcile_completion_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount each book\'s completion_count from UserBook, fixing any drift'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_completion_counts()
+        self.stdout.write(self.style.SUCCESS(f"Corrected {fixed} book completion counts"))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from pages.imports import claim_next_job, run_import_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued award list uploads (run one or more of these as workers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of polling for new jobs'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5,
+            help='Seconds to wait between checks of an empty queue'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Drop connections the server closed or that outlived CONN_MAX_AGE,
+            # as the request cycle does for web workers
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f"Starting {job}")
+            run_import_job(job)
+            job.refresh_from_db()
+            style = self.style.SUCCESS if job.status == job.SUCCEEDED else self.style.ERROR
+            self.stdout.write(style(
+                f"Finished {job}: {job.processed_rows} rows, {job.error_count} errors"
+            ))
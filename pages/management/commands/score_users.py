@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from pages.scoring import score_all_users
+
+
+class Command(BaseCommand):
+    help = 'Compute XP scores for all users in one pass over the award catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Only score the given username (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        usernames = dict(users.values_list('id', 'username'))
+
+        reports = score_all_users(user_ids=list(usernames))
+
+        ranked = sorted(
+            reports.items(), key=lambda item: item[1]['total_points'], reverse=True
+        )
+        for user_id, report in ranked:
+            self.stdout.write(
+                f"{usernames[user_id]}: {report['total_points']} XP "
+                f"({report['completed_books_count']} books, "
+                f"{report['completed_books_pages']} pages, "
+                f"{len(report['completed_lists'])} lists completed)"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Scored {len(reports)} users"))
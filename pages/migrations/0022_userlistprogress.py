@@ -0,0 +1,100 @@
+# Generated by Django 5.1.2 on 2026-10-17 14:41
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_list_progress(apps, schema_editor):
+    BookCategory = apps.get_model("pages", "BookCategory")
+    UserBook = apps.get_model("pages", "UserBook")
+    UserListProgress = apps.get_model("pages", "UserListProgress")
+
+    lists_by_book = defaultdict(list)
+    list_sizes = defaultdict(int)
+    for book_id, category_id, year in BookCategory.objects.order_by().values_list(
+        "book_id", "category_id", "year"
+    ).iterator(chunk_size=BATCH_SIZE):
+        lists_by_book[book_id].append((category_id, year))
+        list_sizes[(category_id, year)] += 1
+
+    progress = defaultdict(lambda: [0, 0])
+    for user_id, book_id, page_count in UserBook.objects.filter(completed=True).values_list(
+        "user_id", "book_id", "book__page_count"
+    ).iterator(chunk_size=BATCH_SIZE):
+        for award_list in lists_by_book.get(book_id, ()):
+            counts = progress[(user_id, award_list)]
+            counts[0] += 1
+            counts[1] += page_count or 0
+
+    UserListProgress.objects.bulk_create(
+        [
+            UserListProgress(
+                user_id=user_id,
+                category_id=category_id,
+                year=year,
+                completed_count=completed_count,
+                total_books=list_sizes[(category_id, year)],
+                pages_read=pages_read,
+            )
+            for (user_id, (category_id, year)), (completed_count, pages_read) in progress.items()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pages", "0021_library_bibliocommons_number_alter_book_slug_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserListProgress",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.IntegerField()),
+                ("completed_count", models.PositiveIntegerField(default=0)),
+                ("total_books", models.PositiveIntegerField(default=0)),
+                ("pages_read", models.PositiveIntegerField(default=0)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="pages.category"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="list_progress",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["category", "year"],
+                        name="pages_userl_categor_cadc55_idx",
+                    )
+                ],
+                "unique_together": {("user", "category", "year")},
+            },
+        ),
+        migrations.RunPython(backfill_list_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.1.2 on 2026-10-17 14:46
+
+from collections import defaultdict
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+import unidecode
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+def normalize(text):
+    return unidecode.unidecode((text or "").strip()).lower()
+
+
+def full_name(person):
+    if person.first_name.strip().lower() == person.last_name.strip().lower():
+        return person.first_name.strip()
+    return f"{person.first_name.strip()} {person.last_name.strip()}".strip()
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX pages_booksearch_vector_idx ON pages_booksearchdocument "
+        "USING gin (search_vector)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX pages_booksearch_trgm_idx ON pages_booksearchdocument "
+        "USING gin (document gin_trgm_ops)"
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS pages_booksearch_vector_idx")
+    schema_editor.execute("DROP INDEX IF EXISTS pages_booksearch_trgm_idx")
+
+
+def backfill_search_documents(apps, schema_editor):
+    Book = apps.get_model("pages", "Book")
+    BookCategory = apps.get_model("pages", "BookCategory")
+    BookSearchDocument = apps.get_model("pages", "BookSearchDocument")
+
+    awards = defaultdict(set)
+    for book_id, category_name in BookCategory.objects.values_list(
+        "book_id", "category__name"
+    ):
+        awards[book_id].add(category_name)
+
+    documents = []
+    for book in Book.objects.select_related("author", "illustrator"):
+        people = [full_name(book.author)]
+        if book.illustrator:
+            people.append(full_name(book.illustrator))
+        title = normalize(book.title)
+        people = normalize(" ".join(people))
+        isbn = (book.isbn or "").strip()
+        award_names = normalize(" ".join(sorted(awards[book.id])))
+        documents.append(
+            BookSearchDocument(
+                book_id=book.id,
+                title=title,
+                people=people,
+                isbn=isbn,
+                awards=award_names,
+                document=" ".join(p for p in (title, people, isbn, award_names) if p),
+            )
+        )
+    BookSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+    if schema_editor.connection.vendor == "postgresql":
+        BookSearchDocument.objects.update(
+            search_vector=SearchVector("title", weight="A", config="simple")
+            + SearchVector("isbn", weight="A", config="simple")
+            + SearchVector("people", weight="B", config="simple")
+            + SearchVector("awards", weight="C", config="simple")
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pages", "0022_userlistprogress"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name="BookSearchDocument",
+            fields=[
+                (
+                    "book",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="pages.book",
+                    ),
+                ),
+                ("title", models.TextField(blank=True)),
+                ("people", models.TextField(blank=True)),
+                ("isbn", models.CharField(blank=True, max_length=13)),
+                ("awards", models.TextField(blank=True)),
+                ("document", models.TextField(blank=True)),
+                (
+                    "search_vector",
+                    django.contrib.postgres.search.SearchVectorField(null=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,142 @@
+# Generated by Django 5.1.2 on 2026-10-17 14:51
+
+from django.db import migrations, models
+
+from pages.normalization import normalize_search_key
+
+BATCH_SIZE = 1000
+PERSON_FIELDS = ["first_name_normalized", "last_name_normalized", "name_normalized"]
+
+
+def full_name(person):
+    if person.first_name.strip().lower() == person.last_name.strip().lower():
+        return person.first_name.strip()
+    return f"{person.first_name.strip()} {person.last_name.strip()}".strip()
+
+
+def normalize_person(person):
+    person.first_name_normalized = normalize_search_key(person.first_name)
+    person.last_name_normalized = normalize_search_key(person.last_name)
+    person.name_normalized = normalize_search_key(full_name(person))
+
+
+def normalize_book(book):
+    book.title_normalized = normalize_search_key(book.title)
+
+
+def backfill_normalized_names(apps, schema_editor):
+    for model_name, normalize, fields in (
+        ("Author", normalize_person, PERSON_FIELDS),
+        ("Illustrator", normalize_person, PERSON_FIELDS),
+        ("Book", normalize_book, ["title_normalized"]),
+    ):
+        model = apps.get_model("pages", model_name)
+        batch = []
+        for obj in model.objects.order_by("pk").iterator(chunk_size=BATCH_SIZE):
+            normalize(obj)
+            batch.append(obj)
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_update(batch, fields)
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pages", "0023_booksearchdocument"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="author",
+            name="first_name_normalized",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="author",
+            name="last_name_normalized",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="author",
+            name="name_normalized",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="title_normalized",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="illustrator",
+            name="first_name_normalized",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="illustrator",
+            name="last_name_normalized",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="illustrator",
+            name="name_normalized",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                fields=["last_name_normalized", "first_name_normalized"],
+                name="author_last_first_norm_idx",
+                opclasses=["varchar_pattern_ops", "varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                fields=["name_normalized"],
+                name="author_name_norm_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["title_normalized"],
+                name="book_title_norm_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="illustrator",
+            index=models.Index(
+                fields=["last_name_normalized", "first_name_normalized"],
+                name="illus_last_first_norm_idx",
+                opclasses=["varchar_pattern_ops", "varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="illustrator",
+            index=models.Index(
+                fields=["name_normalized"],
+                name="illus_name_norm_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.RunPython(backfill_normalized_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.2 on 2026-10-17 14:53
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_completions(apps, schema_editor):
+    Book = apps.get_model("pages", "Book")
+    UserBook = apps.get_model("pages", "UserBook")
+    completed = (
+        UserBook.objects.filter(book=OuterRef("pk"), completed=True)
+        .order_by()
+        .values("book")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    Book.objects.update(
+        completion_count=Coalesce(Subquery(completed, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pages", "0024_normalized_names"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="completion_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["-completion_count", "title"], name="book_completion_idx"
+            ),
+        ),
+        migrations.RunPython(count_completions, migrations.RunPython.noop),
+    ]
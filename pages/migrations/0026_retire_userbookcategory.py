@@ -0,0 +1,16 @@
+# Generated by Django 5.1.2 on 2026-10-17 14:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pages", "0025_book_completion_count"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="UserBookCategory",
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.2 on 2026-10-17 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pages", "0027_importjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportStagingRow",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("batch", models.UUIDField()),
+                ("row_num", models.PositiveIntegerField()),
+                ("title", models.CharField(max_length=200)),
+                ("title_normalized", models.CharField(blank=True, max_length=255)),
+                ("first_name", models.CharField(blank=True, max_length=100)),
+                ("last_name", models.CharField(blank=True, max_length=100)),
+                ("first_name_normalized", models.CharField(blank=True, max_length=255)),
+                ("last_name_normalized", models.CharField(blank=True, max_length=255)),
+                (
+                    "illustrator_first_name",
+                    models.CharField(blank=True, max_length=100),
+                ),
+                ("illustrator_last_name", models.CharField(blank=True, max_length=100)),
+                (
+                    "illustrator_first_name_normalized",
+                    models.CharField(blank=True, max_length=255),
+                ),
+                (
+                    "illustrator_last_name_normalized",
+                    models.CharField(blank=True, max_length=255),
+                ),
+                ("year", models.IntegerField(null=True)),
+                ("category_id", models.IntegerField(null=True)),
+                ("level_id", models.IntegerField(null=True)),
+                ("author_id", models.IntegerField(null=True)),
+                ("illustrator_id", models.IntegerField(null=True)),
+                ("book_id", models.IntegerField(null=True)),
+                ("error", models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["batch", "row_num"], name="pages_impor_batch_588c1b_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pages", "0028_importstagingrow"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importjob",
+            name="processed_bytes",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="total_bytes",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-17 15:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pages", "0029_importjob_bytes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importstagingrow",
+            name="error_column",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.CreateModel(
+            name="ImportRowError",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("row", models.PositiveIntegerField()),
+                ("column", models.CharField(blank=True, max_length=50)),
+                ("reason", models.CharField(max_length=255)),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="row_errors",
+                        to="pages.importjob",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["row", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["job", "row"], name="pages_impor_job_id_53ca63_idx"
+                    )
+                ],
+            },
+        ),
+    ]
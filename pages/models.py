@@ -5,11 +5,15 @@ import uuid
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.utils.text import slugify
 
 from django_project.storage_backends import MediaStorage
 
+from .normalization import NORMALIZED_MAX_LENGTH, normalize_search_key
+from .slugs import allocate_slugs
+
 
 def upload_to_book_images(instance, filename):
     # Get the file extension (e.g., '.jpg', '.png')
@@ -20,6 +24,110 @@ def upload_to_book_images(instance, filename):
     return f"book_images/{new_filename}"
 
 
+class NormalizedFieldsQuerySet(models.QuerySet):
+    """Keeps *_normalized columns in sync through bulk writes that skip save()"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.set_normalized_fields()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.set_normalized_fields()
+        return super().bulk_update(
+            objs, self.model.with_normalized_fields(fields), *args, **kwargs
+        )
+
+    def update(self, **kwargs):
+        if not self.model.normalized_sources.intersection(kwargs):
+            return super().update(**kwargs)
+
+        # Normalized values depend on the whole row, so recompute them afterwards
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list("pk", flat=True))
+            rows = super().update(**kwargs)
+            objs = list(self.model._base_manager.using(self.db).filter(pk__in=pks))
+            for obj in objs:
+                obj.set_normalized_fields()
+            self.model._base_manager.using(self.db).bulk_update(
+                objs, self.model.normalized_fields, batch_size=1000
+            )
+        return rows
+
+
+class NormalizedFieldsMixin:
+    """
+    Stores accent- and case-insensitive copies of text columns.
+
+    Subclasses list the columns they derive from in normalized_sources, the
+    derived columns in normalized_fields, and fill them in set_normalized_fields().
+    """
+
+    normalized_sources = frozenset()
+    normalized_fields = ()
+
+    def set_normalized_fields(self):
+        raise NotImplementedError
+
+    @classmethod
+    def with_normalized_fields(cls, fields):
+        """Add the normalized columns to update_fields that touch their sources"""
+        fields = list(fields)
+        if cls.normalized_sources.intersection(fields):
+            fields += [field for field in cls.normalized_fields if field not in fields]
+        return fields
+
+    def save(self, *args, **kwargs):
+        self.set_normalized_fields()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = self.with_normalized_fields(kwargs["update_fields"])
+        super().save(*args, **kwargs)
+
+
+class SearchFieldsMixin:
+    """
+    Remembers the values of the fields site search is built from.
+
+    Subclasses list those fields in search_fields. The values are recorded
+    when a row is loaded and after each save, so search_fields_changed() can
+    tell a rename from a save that only touched other columns.
+    """
+
+    search_fields = ()
+
+    def _search_values(self):
+        values = {}
+        for name in self.search_fields:
+            attname = self._meta.get_field(name).attname
+            if attname in self.__dict__:  # Deferred fields were not loaded
+                values[name] = self.__dict__[attname]
+        return values
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_search_values = instance._search_values()
+        return instance
+
+    def search_fields_changed(self, update_fields=None):
+        loaded = getattr(self, "_loaded_search_values", None)
+        if loaded is None:
+            return True
+        current = self._search_values()
+        return any(
+            name not in loaded or loaded[name] != current.get(name)
+            for name in self.search_fields
+            if update_fields is None or name in update_fields
+        )
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_search_values = self._search_values()
+
+
 # Create your models here.
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)  # e.g., "Caldecott", "Newbery"
@@ -56,9 +164,30 @@ class AwardLevel(models.Model):
         return self.name
 
 
-class Author(models.Model):
+class Author(SearchFieldsMixin, NormalizedFieldsMixin, models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
+    # Accent- and case-insensitive copies for search and matching
+    first_name_normalized = models.CharField(
+        max_length=NORMALIZED_MAX_LENGTH, blank=True, default="", editable=False
+    )
+    last_name_normalized = models.CharField(
+        max_length=NORMALIZED_MAX_LENGTH, blank=True, default="", editable=False
+    )
+    name_normalized = models.CharField(
+        max_length=NORMALIZED_MAX_LENGTH, blank=True, default="", editable=False
+    )
+
+    objects = NormalizedFieldsQuerySet.as_manager()
+
+    normalized_sources = frozenset(["first_name", "last_name"])
+    search_fields = ("first_name", "last_name")
+    normalized_fields = ("first_name_normalized", "last_name_normalized", "name_normalized")
+
+    def set_normalized_fields(self):
+        self.first_name_normalized = normalize_search_key(self.first_name)
+        self.last_name_normalized = normalize_search_key(self.last_name)
+        self.name_normalized = normalize_search_key(self.full_name)
 
     @property
     def full_name(self):
@@ -79,12 +208,44 @@ class Author(models.Model):
             models.Index(fields=['first_name']),
             models.Index(fields=['last_name']),
             models.Index(fields=['first_name', 'last_name']),
+            # pattern_ops so prefix (LIKE 'x%') lookups can use the index on PostgreSQL
+            models.Index(
+                fields=['last_name_normalized', 'first_name_normalized'],
+                name='author_last_first_norm_idx',
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+            ),
+            models.Index(
+                fields=['name_normalized'],
+                name='author_name_norm_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
         ]
 
 
-class Illustrator(models.Model):
+class Illustrator(SearchFieldsMixin, NormalizedFieldsMixin, models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
+    # Accent- and case-insensitive copies for search and matching
+    first_name_normalized = models.CharField(
+        max_length=NORMALIZED_MAX_LENGTH, blank=True, default="", editable=False
+    )
+    last_name_normalized = models.CharField(
+        max_length=NORMALIZED_MAX_LENGTH, blank=True, default="", editable=False
+    )
+    name_normalized = models.CharField(
+        max_length=NORMALIZED_MAX_LENGTH, blank=True, default="", editable=False
+    )
+
+    objects = NormalizedFieldsQuerySet.as_manager()
+
+    normalized_sources = frozenset(["first_name", "last_name"])
+    search_fields = ("first_name", "last_name")
+    normalized_fields = ("first_name_normalized", "last_name_normalized", "name_normalized")
+
+    def set_normalized_fields(self):
+        self.first_name_normalized = normalize_search_key(self.first_name)
+        self.last_name_normalized = normalize_search_key(self.last_name)
+        self.name_normalized = normalize_search_key(self.full_name)
 
     @property
     def full_name(self):
@@ -105,11 +266,25 @@ class Illustrator(models.Model):
             models.Index(fields=['first_name']),
             models.Index(fields=['last_name']),
             models.Index(fields=['first_name', 'last_name']),
+            # pattern_ops so prefix (LIKE 'x%') lookups can use the index on PostgreSQL
+            models.Index(
+                fields=['last_name_normalized', 'first_name_normalized'],
+                name='illus_last_first_norm_idx',
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+            ),
+            models.Index(
+                fields=['name_normalized'],
+                name='illus_name_norm_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
         ]
 
 
-class Book(models.Model):
+class Book(SearchFieldsMixin, NormalizedFieldsMixin, models.Model):
     title = models.CharField(max_length=200)
+    title_normalized = models.CharField(
+        max_length=NORMALIZED_MAX_LENGTH, blank=True, default="", editable=False
+    )
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name="books")
     illustrator = models.ForeignKey(
         Illustrator,
@@ -123,6 +298,8 @@ class Book(models.Model):
     page_count = models.IntegerField(blank=True, null=True)
     bibliocommons_id = models.CharField(max_length=20, blank=True, null=True)
     asin = models.CharField(max_length=20, blank=True, null=True)
+    # Readers who have completed the book, kept by pages.progress
+    completion_count = models.PositiveIntegerField(default=0, editable=False)
     slug = models.SlugField(max_length=256, blank=True, unique=True)
     image = models.ImageField(
         upload_to=upload_to_book_images,  # Use the custom function
@@ -131,21 +308,37 @@ class Book(models.Model):
         null=True,
     )
 
+    objects = NormalizedFieldsQuerySet.as_manager()
+
+    normalized_sources = frozenset(["title"])
+    search_fields = ("title", "slug", "author", "illustrator")
+    normalized_fields = ("title_normalized",)
+
+    def set_normalized_fields(self):
+        self.title_normalized = normalize_search_key(self.title)
+
     def save(self, *args, **kwargs):
         if not self.slug:
-            # Truncate title if it's too long (allowing space for author names)
-            title_slug = slugify(self.title)[:100]  # Allocate more space for title
-            first_name_slug = slugify(self.author.first_name)[:40]
-            last_name_slug = slugify(self.author.last_name)[:40]
-
-            # Join the components
-            self.slug = "-".join(
+            # Title and author, as book URLs have always been; the allocator
+            # adds a suffix if that is taken
+            base = "-".join(
                 (
-                    title_slug,
-                    first_name_slug,
-                    last_name_slug,
+                    slugify(self.title)[:100],
+                    slugify(self.author.first_name)[:40],
+                    slugify(self.author.last_name)[:40],
                 )
-            )[:200]  # Keep the overall length constraint
+            )[:200]
+            self.slug = allocate_slugs(Book.objects, [base])[0]
+        if not self._state.adding and not kwargs.get("force_insert") and kwargs.get(
+            "update_fields"
+        ) is None:
+            # completion_count is only changed with F() updates, so a full save of
+            # a stale instance must not write back the value it loaded
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "completion_count"
+            ]
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -155,6 +348,12 @@ class Book(models.Model):
         ordering = ["title"]
         indexes = [
             models.Index(fields=["title"]),
+            models.Index(
+                fields=["title_normalized"],
+                name="book_title_norm_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+            models.Index(fields=["-completion_count", "title"], name="book_completion_idx"),
         ]
 
     @property
@@ -187,6 +386,29 @@ class BookCategory(models.Model):
         return f"{self.book.title} ({self.category.name} - {award} - {self.year})"
 
 
+class BookSearchDocument(models.Model):
+    """
+    Denormalized, normalized text of a book used by site search.
+
+    Kept in sync by pages.search. On PostgreSQL search_vector carries a GIN
+    full-text index and document a trigram index; other databases fall back
+    to substring matching on document.
+    """
+
+    book = models.OneToOneField(
+        Book, on_delete=models.CASCADE, primary_key=True, related_name="search_document"
+    )
+    title = models.TextField(blank=True)
+    people = models.TextField(blank=True)  # Author and illustrator names
+    isbn = models.CharField(max_length=13, blank=True)
+    awards = models.TextField(blank=True)  # Names of the award lists it is on
+    document = models.TextField(blank=True)  # All of the above, for fuzzy matching
+    search_vector = SearchVectorField(null=True)
+
+    def __str__(self):
+        return self.document
+
+
 class SharedList(models.Model):
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="shared_lists"
@@ -200,22 +422,6 @@ class SharedList(models.Model):
         return f"List shared by {self.owner.username} to {self.recipient_email}"
 
 
-class UserBookCategory(models.Model):
-    user = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE,
-        related_name="user_book_categories",
-    )
-    book_category = models.ForeignKey(BookCategory, on_delete=models.CASCADE)
-    completed = models.BooleanField(default=False)
-
-    class Meta:
-        unique_together = ("user", "book_category")
-
-    def __str__(self):
-        return f"{self.user.username} - {self.book_category} ({'Completed' if self.completed else 'Not Completed'})"
-
-
 class WebPlatform(models.Model):
     name = models.CharField(max_length=100)
     url = models.URLField()
@@ -301,6 +507,33 @@ class UserBook(models.Model):
         return f"{self.user.username} - {self.book.title} ({'Completed' if self.completed else 'Not Completed'})"
 
 
+class UserListProgress(models.Model):
+    """
+    Denormalized progress of one user on one award list (category + year).
+
+    Maintained incrementally by the read/unread write paths in pages.progress,
+    and rebuilt from UserBook with the rebuild_list_progress command.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="list_progress"
+    )
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    year = models.IntegerField()
+    completed_count = models.PositiveIntegerField(default=0)
+    total_books = models.PositiveIntegerField(default=0)
+    pages_read = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "category", "year")
+        indexes = [
+            models.Index(fields=["category", "year"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.category.name} {self.year} ({self.completed_count}/{self.total_books})"
+
+
 class UserFavoriteLibrary(models.Model):
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     library = models.ForeignKey("Library", on_delete=models.CASCADE)
@@ -326,3 +559,138 @@ class AwardYearLike(models.Model):
 
     def __str__(self):
         return f"{self.user.username} likes {self.category.name} ({self.year})"
+
+
+def upload_to_imports(instance, filename):
+    ext = os.path.splitext(filename)[1]
+    return f"imports/{uuid.uuid4()}{ext}"
+
+
+class ImportJob(models.Model):
+    """
+    A queued award list upload, processed by the run_import_jobs worker.
+
+    Progress counters are updated as batches finish so the upload page can
+    poll them.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="import_jobs",
+    )
+    file = models.FileField(upload_to=upload_to_imports, storage=MediaStorage())
+    original_filename = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    total_rows = models.PositiveIntegerField(default=0)  # Known once the file is read
+    processed_rows = models.PositiveIntegerField(default=0)
+    total_bytes = models.PositiveBigIntegerField(default=0)
+    processed_bytes = models.PositiveBigIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)  # Times a worker has claimed it
+    # Problems with the file as a whole; problems with single rows are ImportRowErrors
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Last progress from the worker
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"Import {self.id} ({self.original_filename}) - {self.status}"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    @property
+    def rows_per_second(self):
+        if not self.started_at or not self.processed_rows:
+            return None
+        end = self.finished_at or self.heartbeat_at or self.started_at
+        elapsed = (end - self.started_at).total_seconds()
+        return self.processed_rows / elapsed if elapsed > 0 else None
+
+    @property
+    def percent_complete(self):
+        # Files are streamed, so progress is measured in bytes read
+        if not self.total_bytes:
+            return 100 if self.is_finished else 0
+        return min(100, round(100 * self.processed_bytes / self.total_bytes))
+
+
+class ImportRowError(models.Model):
+    """One problem with one row of an import, for the downloadable error report"""
+
+    job = models.ForeignKey(ImportJob, on_delete=models.CASCADE, related_name="row_errors")
+    row = models.PositiveIntegerField()
+    column = models.CharField(max_length=50, blank=True)
+    reason = models.CharField(max_length=255)
+
+    class Meta:
+        ordering = ["row", "id"]
+        indexes = [
+            models.Index(fields=["job", "row"]),
+        ]
+
+    def __str__(self):
+        return f"Row {self.row}: {self.reason}"
+
+
+class ImportStagingRow(models.Model):
+    """
+    One parsed upload row, staged so pages.staging can merge a whole batch
+    into the catalog with set-based statements.
+
+    References are plain integers rather than foreign keys: rows are checked
+    against the catalog after loading and deleted once their batch is merged.
+    """
+
+    batch = models.UUIDField()
+    row_num = models.PositiveIntegerField()
+    title = models.CharField(max_length=200)
+    title_normalized = models.CharField(max_length=NORMALIZED_MAX_LENGTH, blank=True)
+    first_name = models.CharField(max_length=100, blank=True)
+    last_name = models.CharField(max_length=100, blank=True)
+    first_name_normalized = models.CharField(max_length=NORMALIZED_MAX_LENGTH, blank=True)
+    last_name_normalized = models.CharField(max_length=NORMALIZED_MAX_LENGTH, blank=True)
+    illustrator_first_name = models.CharField(max_length=100, blank=True)
+    illustrator_last_name = models.CharField(max_length=100, blank=True)
+    illustrator_first_name_normalized = models.CharField(
+        max_length=NORMALIZED_MAX_LENGTH, blank=True
+    )
+    illustrator_last_name_normalized = models.CharField(
+        max_length=NORMALIZED_MAX_LENGTH, blank=True
+    )
+    year = models.IntegerField(null=True)
+    category_id = models.IntegerField(null=True)
+    level_id = models.IntegerField(null=True)
+    # Filled in while merging
+    author_id = models.IntegerField(null=True)
+    illustrator_id = models.IntegerField(null=True)
+    book_id = models.IntegerField(null=True)
+    error = models.CharField(max_length=255, blank=True)
+    error_column = models.CharField(max_length=50, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["batch", "row_num"]),
+        ]
@@ -0,0 +1,49 @@
+import unicodedata
+
+import unidecode
+
+NORMALIZED_MAX_LENGTH = 255
+
+
+def normalize_text_advanced(text):
+    """
+    Advanced text normalization for better Unicode matching
+    """
+    if not text:
+        return ""
+
+    # Strip whitespace
+    text = text.strip()
+
+    # Normalize Unicode (NFD = decomposed form)
+    text = unicodedata.normalize('NFD', text)
+
+    # Remove diacritical marks (accents, etc.)
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+
+    # Convert to lowercase
+    text = text.lower()
+
+    return text
+
+
+def normalize_text_transliterate(text):
+    """
+    Alternative normalization using transliteration to ASCII
+    """
+    if not text:
+        return ""
+
+    # Strip and convert to ASCII equivalents
+    text = text.strip()
+    text = unidecode.unidecode(text).lower()
+
+    return text
+
+
+def normalize_search_key(text):
+    """
+    Accent- and case-insensitive lookup key stored in the *_normalized columns,
+    so "Peña" and "pena" compare equal.
+    """
+    return " ".join(normalize_text_transliterate(text).split())[:NORMALIZED_MAX_LENGTH]
@@ -0,0 +1,310 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import (Case, Count, Exists, F, IntegerField, OuterRef, Q, Subquery,
+                              Sum, Value, When)
+from django.db.models.functions import Coalesce, Greatest
+
+from .catalog import get_membership_index
+from .models import Book, BookCategory, UserBook, UserListProgress
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def _lists_filter(award_lists):
+    """Q object matching any of the given (category_id, year) lists"""
+    condition = Q(pk__in=[])
+    for category_id, year in award_lists:
+        condition |= Q(category_id=category_id, year=year)
+    return condition
+
+
+def book_completed_by(user):
+    """
+    Exists() expression for BookCategory querysets: has the user read the book?
+
+    Read state lives only on UserBook; per-list completion is derived from it.
+    """
+    return Exists(UserBook.objects.filter(user=user, book=OuterRef("book"), completed=True))
+
+
+def _progress_changes(books):
+    """
+    Books and pages per (category_id, year) list across the given books.
+
+    Read from the current memberships and page counts, inside the caller's
+    transaction, rather than from a cached index that may lag behind.
+    """
+    changes = defaultdict(lambda: [0, 0])
+    for category_id, year, page_count in (
+        BookCategory.objects.filter(book_id__in=[book.pk for book in books])
+        .order_by()
+        .values_list("category_id", "year", "book__page_count")
+    ):
+        counts = changes[(category_id, year)]
+        counts[0] += 1
+        counts[1] += page_count or 0
+    return changes
+
+
+def _list_sizes(award_lists):
+    """Number of books on each of the given (category_id, year) lists"""
+    return {
+        (category_id, year): total
+        for category_id, year, total in BookCategory.objects.filter(_lists_filter(award_lists))
+        .order_by()
+        .values_list("category_id", "year")
+        .annotate(total=Count("id"))
+    }
+
+
+def _adjusted(field, changes, position, sign):
+    """Expression adding each list's change to `field`, in a single UPDATE"""
+    return Case(
+        *(
+            When(
+                category_id=category_id,
+                year=year,
+                then=F(field) + sign * counts[position],
+            )
+            for (category_id, year), counts in changes.items()
+        ),
+        default=F(field),
+        output_field=IntegerField(),
+    )
+
+
+def record_books_read(user, books):
+    """Count newly completed books and add them to the user's list progress"""
+    with transaction.atomic(savepoint=False):
+        Book.objects.filter(pk__in=[book.pk for book in books]).update(
+            completion_count=F("completion_count") + 1
+        )
+
+        changes = _progress_changes(books)
+        if not changes:
+            return
+
+        # Make sure a row exists for every list, then bump them all in one UPDATE
+        list_sizes = _list_sizes(changes)
+        UserListProgress.objects.bulk_create(
+            [
+                UserListProgress(
+                    user=user,
+                    category_id=category_id,
+                    year=year,
+                    total_books=list_sizes[(category_id, year)],
+                )
+                for category_id, year in changes
+            ],
+            ignore_conflicts=True,
+        )
+        UserListProgress.objects.filter(_lists_filter(changes), user=user).update(
+            completed_count=_adjusted("completed_count", changes, 0, 1),
+            pages_read=_adjusted("pages_read", changes, 1, 1),
+        )
+
+
+def record_books_unread(user, books):
+    """Uncount books the user no longer has completed and update list progress"""
+    with transaction.atomic(savepoint=False):
+        Book.objects.filter(pk__in=[book.pk for book in books], completion_count__gt=0).update(
+            completion_count=F("completion_count") - 1
+        )
+
+        changes = _progress_changes(books)
+        if not changes:
+            return
+
+        UserListProgress.objects.filter(_lists_filter(changes), user=user).update(
+            completed_count=Greatest(_adjusted("completed_count", changes, 0, -1), Value(0)),
+            pages_read=Greatest(_adjusted("pages_read", changes, 1, -1), Value(0)),
+        )
+
+
+def set_books_completed(user, books, completed):
+    """
+    Mark books read or unread for a user in one transaction.
+
+    The UserBook rows that would change are locked before they are written,
+    so concurrent calls for the same books wait for each other and only the
+    first one counts the change. Counters and list progress are touched only
+    for books whose state actually changes. Returns those books.
+    """
+    books = list(books)
+    if not books:
+        return []
+
+    with transaction.atomic():
+        if completed:
+            # Every book needs a row to lock; the unread ones are flipped below
+            UserBook.objects.bulk_create(
+                [UserBook(user=user, book=book) for book in books], ignore_conflicts=True
+            )
+        # A concurrent writer holding these rows makes us wait, after which
+        # rows it already changed no longer match the filter
+        changed_ids = set(
+            UserBook.objects.select_for_update()
+            .filter(user=user, book_id__in=[book.id for book in books], completed=not completed)
+            .values_list("book_id", flat=True)
+        )
+        changed = [book for book in books if book.id in changed_ids]
+        if changed:
+            UserBook.objects.filter(
+                user=user, book_id__in=changed_ids, completed=not completed
+            ).update(completed=completed)
+            if completed:
+                record_books_read(user, changed)
+            else:
+                record_books_unread(user, changed)
+
+    return changed
+
+
+def set_book_completed(user, book, completed):
+    """Mark one book read or unread, returning whether its state changed"""
+    return bool(set_books_completed(user, [book], completed))
+
+
+def toggle_book_completed(user, book):
+    """Flip one book between read and unread, returning its new state"""
+    with transaction.atomic():
+        user_book, _ = UserBook.objects.get_or_create(user=user, book=book)
+        # Read the current state under the row lock so two toggles can't both flip it
+        completed = not UserBook.objects.select_for_update().get(pk=user_book.pk).completed
+        set_books_completed(user, [book], completed)
+    return completed
+
+
+def refresh_list_progress(category_id, year):
+    """
+    Recompute every user's progress on one list.
+
+    Called when a book is added to or removed from the list, which changes the
+    total for everyone and the completed count for users who have read it.
+    """
+    book_ids = BookCategory.objects.filter(category_id=category_id, year=year).values(
+        "book_id"
+    )
+    total_books = BookCategory.objects.filter(category_id=category_id, year=year).count()
+    per_user = (
+        UserBook.objects.filter(completed=True, book_id__in=book_ids)
+        .values("user_id")
+        .annotate(
+            completed_count=Count("id"),
+            pages_read=Coalesce(Sum("book__page_count"), 0),
+        )
+    )
+
+    with transaction.atomic():
+        UserListProgress.objects.filter(category_id=category_id, year=year).delete()
+        UserListProgress.objects.bulk_create(
+            [
+                UserListProgress(
+                    user_id=row["user_id"],
+                    category_id=category_id,
+                    year=year,
+                    completed_count=row["completed_count"],
+                    total_books=total_books,
+                    pages_read=row["pages_read"],
+                )
+                for row in per_user
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+
+
+def refresh_book_pages(book):
+    """
+    Recompute pages_read on the book's lists for the users who have read it.
+
+    Called when a book's page_count changes, which shifts the pages of every
+    list progress row that counted the book.
+    """
+    memberships = BookCategory.objects.filter(book=book).order_by()
+    pages = (
+        UserBook.objects.filter(
+            user=OuterRef("user"),
+            completed=True,
+            book__bookcategory__category=OuterRef("category"),
+            book__bookcategory__year=OuterRef("year"),
+        )
+        .order_by()
+        .values("user")
+        .annotate(total=Sum("book__page_count"))
+        .values("total")
+    )
+    UserListProgress.objects.filter(
+        _lists_filter(memberships.values_list("category_id", "year")),
+        user__in=UserBook.objects.filter(book=book, completed=True).values("user"),
+    ).update(pages_read=Coalesce(Subquery(pages, output_field=IntegerField()), 0))
+
+
+def rebuild_user_progress(user_ids=None):
+    """
+    Rebuild progress rows from UserBook for the given users (or everyone).
+
+    Returns the number of rows written.
+    """
+    index = get_membership_index()
+    completed_books = UserBook.objects.filter(completed=True)
+    existing = UserListProgress.objects.all()
+    if user_ids is not None:
+        completed_books = completed_books.filter(user_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+
+    progress = defaultdict(lambda: [0, 0])
+    for user_id, book_id, page_count in completed_books.values_list(
+        "user_id", "book_id", "book__page_count"
+    ).iterator():
+        for award_list in index.lists_by_book.get(book_id, ()):
+            counts = progress[(user_id, award_list)]
+            counts[0] += 1
+            counts[1] += page_count or 0
+
+    rows = [
+        UserListProgress(
+            user_id=user_id,
+            category_id=category_id,
+            year=year,
+            completed_count=completed_count,
+            total_books=index.list_sizes[(category_id, year)],
+            pages_read=pages_read,
+        )
+        for (user_id, (category_id, year)), (completed_count, pages_read) in progress.items()
+    ]
+
+    with transaction.atomic():
+        existing.delete()
+        UserListProgress.objects.bulk_create(rows, batch_size=REBUILD_BATCH_SIZE)
+
+    return len(rows)
+
+
+def reconcile_completion_counts():
+    """
+    Reset every book's completion_count to its number of completed UserBooks.
+
+    Returns the number of books whose counter had drifted.
+    """
+    completed = (
+        UserBook.objects.filter(book=OuterRef("pk"), completed=True)
+        .order_by()
+        .values("book")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    actual = Coalesce(Subquery(completed, output_field=IntegerField()), 0)
+    return (
+        Book.objects.annotate(actual=actual)
+        .exclude(completion_count=F("actual"))
+        .update(completion_count=actual)
+    )
+
+
+def get_user_progress(user):
+    """Return a dict of (category_id, year) -> UserListProgress for one user"""
+    return {
+        (progress.category_id, progress.year): progress
+        for progress in UserListProgress.objects.filter(user=user)
+    }
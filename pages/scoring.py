@@ -0,0 +1,147 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Count, Sum
+
+from .catalog import get_membership_index
+from .models import AwardYearLike, UserBook, UserListProgress
+
+NEAR_COMPLETION_THRESHOLD = 0.3  # 30%
+POINTS_PER_BOOK = 100
+POINTS_PER_COMPLETED_LIST = 500
+
+
+def count_list_progress(completed_books, index):
+    """
+    Count the user's completed books on every award list in a single pass.
+
+    completed_books is an iterable of book ids. Every list the user has touched
+    is counted through the inverted index, so the cost depends on the user's
+    books rather than on the size of the catalog. Yields
+    ((category_id, year), completed_count, total_books) tuples.
+    """
+    completed_counts = Counter(index.lists_for_books(completed_books))
+    for award_list, completed_count in completed_counts.items():
+        yield award_list, completed_count, index.list_sizes[award_list]
+
+
+def score_user(
+    completed_books_count, completed_books_pages, list_progress, liked_lists, categories
+):
+    """
+    Build an XP report from a user's totals and per-list progress.
+
+    list_progress is an iterable of ((category_id, year), completed_count,
+    total_books) tuples, liked_lists a set of (category_id, year) pairs and
+    categories maps a category id to its (name, slug).
+    """
+    completed_lists = []
+    near_complete_lists = []
+    discoverable_lists = []  # For lists user hasn't liked yet
+
+    for award_list, completed_count, total_books in sorted(list_progress):
+        category_id, year = award_list
+        if not completed_count or not total_books:
+            continue
+        completion_ratio = completed_count / total_books
+        # Skip if completion ratio is too low
+        if completion_ratio < NEAR_COMPLETION_THRESHOLD:
+            continue
+
+        name, slug = categories[category_id]
+        list_data = {
+            "category": name,
+            "category_slug": slug,
+            "year": year,
+            "completed_count": completed_count,
+            "total_books": total_books,
+            "completion_percentage": round(completion_ratio * 100, 1),
+        }
+        # Add to appropriate list based on whether it's liked and completion status
+        if award_list in liked_lists:
+            if completion_ratio == 1.0:
+                completed_lists.append(list_data)
+            else:
+                near_complete_lists.append(list_data)
+        else:
+            discoverable_lists.append(list_data)
+
+    completed_lists.sort(key=lambda x: x["year"], reverse=True)
+    near_complete_lists.sort(key=lambda x: x["completion_percentage"], reverse=True)
+    discoverable_lists.sort(key=lambda x: x["completion_percentage"], reverse=True)
+
+    points_from_pages = completed_books_pages
+    points_from_books = completed_books_count * POINTS_PER_BOOK
+    points_from_awards = len(completed_lists) * POINTS_PER_COMPLETED_LIST
+
+    return {
+        "completed_books_count": completed_books_count,
+        "completed_books_pages": completed_books_pages,
+        "completed_lists": completed_lists,
+        "near_complete_lists": near_complete_lists,
+        "discoverable_lists": discoverable_lists,
+        "points_from_pages": points_from_pages,
+        "points_from_books": points_from_books,
+        "points_from_awards": points_from_awards,
+        "total_points": points_from_pages + points_from_books + points_from_awards,
+    }
+
+
+def xp_report_for_user(user):
+    """Build the XP report for one user from their stored list progress"""
+    totals = UserBook.objects.filter(user=user, completed=True).aggregate(
+        count=Count("id"), pages=Sum("book__page_count")
+    )
+    progress_rows = UserListProgress.objects.filter(user=user).values_list(
+        "category_id", "year", "completed_count", "total_books"
+    )
+    list_progress = [
+        ((category_id, year), completed_count, total_books)
+        for category_id, year, completed_count, total_books in progress_rows
+    ]
+    liked_lists = set(
+        AwardYearLike.objects.filter(user=user).values_list("category_id", "year")
+    )
+    return score_user(
+        totals["count"],
+        totals["pages"] or 0,
+        list_progress,
+        liked_lists,
+        get_membership_index().categories,
+    )
+
+
+def score_all_users(user_ids=None):
+    """
+    Score many users at once.
+
+    Loads every completed book and every like in one query each and returns a
+    dict of user id -> report, as produced by score_user.
+    """
+    completed_books = UserBook.objects.filter(completed=True)
+    likes = AwardYearLike.objects.all()
+    if user_ids is not None:
+        completed_books = completed_books.filter(user_id__in=user_ids)
+        likes = likes.filter(user_id__in=user_ids)
+
+    books_by_user = defaultdict(list)
+    for user_id, book_id, page_count in completed_books.values_list(
+        "user_id", "book_id", "book__page_count"
+    ):
+        books_by_user[user_id].append((book_id, page_count))
+
+    likes_by_user = defaultdict(set)
+    for user_id, category_id, year in likes.values_list("user_id", "category_id", "year"):
+        likes_by_user[user_id].add((category_id, year))
+
+    index = get_membership_index()
+    reports = {}
+    for user_id in set(books_by_user) | set(likes_by_user):
+        books = books_by_user[user_id]
+        reports[user_id] = score_user(
+            len(books),
+            sum(page_count or 0 for _, page_count in books),
+            count_list_progress((book_id for book_id, _ in books), index),
+            likes_by_user[user_id],
+            index.categories,
+        )
+    return reports
@@ -0,0 +1,126 @@
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from .models import Book, BookCategory, BookSearchDocument
+from .normalization import normalize_search_key
+
+SEARCH_CONFIG = "simple"  # Names and titles aren't English prose, so don't stem them
+REBUILD_BATCH_SIZE = 500
+
+
+def uses_full_text_search():
+    return connection.vendor == "postgresql"
+
+
+def _search_vector():
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("isbn", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("people", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("awards", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def build_search_documents(book_ids):
+    """Build unsaved BookSearchDocuments for the given books with two queries"""
+    awards = defaultdict(set)
+    for book_id, category_name in BookCategory.objects.filter(
+        book_id__in=book_ids
+    ).values_list("book_id", "category__name"):
+        awards[book_id].add(category_name)
+
+    documents = []
+    for book in Book.objects.filter(id__in=book_ids).select_related("author", "illustrator"):
+        people = [book.author.full_name]
+        if book.illustrator:
+            people.append(book.illustrator.full_name)
+
+        title = normalize_search_key(book.title)
+        people = normalize_search_key(" ".join(people))
+        isbn = (book.isbn or "").strip()
+        award_names = normalize_search_key(" ".join(sorted(awards[book.id])))
+        documents.append(
+            BookSearchDocument(
+                book_id=book.id,
+                title=title,
+                people=people,
+                isbn=isbn,
+                awards=award_names,
+                document=" ".join(part for part in (title, people, isbn, award_names) if part),
+            )
+        )
+    return documents
+
+
+def update_search_documents(book_ids):
+    """Rebuild the search documents of the given books"""
+    book_ids = list(set(book_ids))
+    if not book_ids:
+        return
+
+    documents = build_search_documents(book_ids)
+    with transaction.atomic():
+        BookSearchDocument.objects.filter(book_id__in=book_ids).delete()
+        BookSearchDocument.objects.bulk_create(documents, batch_size=REBUILD_BATCH_SIZE)
+        if uses_full_text_search():
+            BookSearchDocument.objects.filter(book_id__in=book_ids).update(
+                search_vector=_search_vector()
+            )
+
+
+def rebuild_search_index():
+    """Rebuild every book's search document, returning how many were written"""
+    book_ids = list(Book.objects.values_list("id", flat=True))
+    for start in range(0, len(book_ids), REBUILD_BATCH_SIZE):
+        update_search_documents(book_ids[start:start + REBUILD_BATCH_SIZE])
+
+    BookSearchDocument.objects.exclude(book_id__in=Book.objects.values("id")).delete()
+    return len(book_ids)
+
+
+def search_books(query):
+    """
+    Books matching the query, best matches first.
+
+    On PostgreSQL this uses the full-text and trigram indexes on the search
+    documents, ranked by weighted full-text rank plus trigram similarity.
+    Elsewhere every word of the query must appear in the document, and books
+    whose title matches rank first.
+    """
+    normalized = normalize_search_key(query)
+    books = Book.objects.select_related("author", "illustrator")
+    if not normalized:
+        return books.none()
+
+    if uses_full_text_search():
+        search_query = SearchQuery(normalized, config=SEARCH_CONFIG, search_type="websearch")
+        return (
+            books.filter(
+                Q(search_document__search_vector=search_query)
+                | Q(search_document__document__trigram_word_similar=normalized)
+            )
+            .annotate(
+                rank=SearchRank(F("search_document__search_vector"), search_query)
+                + TrigramSimilarity("search_document__document", normalized)
+            )
+            .order_by("-rank", "title")
+        )
+
+    matches = Q()
+    for word in normalized.split():
+        matches &= Q(search_document__document__contains=word)
+    return (
+        books.filter(matches)
+        .annotate(
+            rank=Case(
+                When(search_document__title__startswith=normalized, then=Value(2)),
+                When(search_document__title__contains=normalized, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by("-rank", "title")
+    )
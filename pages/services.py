@@ -1,19 +1,76 @@
 import json
+import logging
 import re
 import requests
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from django.conf import settings
 from django.core.files.base import ContentFile
+from django.db import transaction
 from django.db.models import Q
 from pages.models import Book  # Replace with your actual app name
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUESTS_PER_SECOND = 2  # ASIN Data API calls allowed per second
+DEFAULT_BURST = 5  # ...and how many may go out back to back after a quiet spell
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_REQUEST_TIMEOUT = 30  # Seconds; the API fetches from Amazon live
+SAVE_BATCH_SIZE = 100
+
+
+class TokenBucket:
+    """
+    Blocking token-bucket rate limiter, safe to share between threads.
+
+    Tokens refill at `rate` per second up to `capacity`; acquire() takes one,
+    sleeping until one is available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            time.sleep(wait_seconds)
 
 
 class AmazonBookMatcher:
     """Class to handle Amazon book searching and matching logic"""
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, rate_limiter=None, max_connections=DEFAULT_MAX_WORKERS,
+                 request_timeout=DEFAULT_REQUEST_TIMEOUT):
         self.api_key = api_key
         self.base_url = "https://api.asindataapi.com/request"
+        self.rate_limiter = rate_limiter
+        self.request_timeout = request_timeout
+
+        # Keep-alive connections shared by the enrichment workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _request(self, params):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        response = self.session.get(self.base_url, params=params, timeout=self.request_timeout)
+        response.raise_for_status()
+        return response.json()
 
     def search_book(self, title, author_name):
         """Search for a book on Amazon and return results"""
@@ -31,9 +88,7 @@ class AmazonBookMatcher:
         }
 
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._request(params)
         except requests.RequestException as e:
             print(f"Error searching for '{title}' by {author_name}: {e}")
             return None
@@ -103,9 +158,7 @@ class AmazonBookMatcher:
         }
 
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._request(params)
         except requests.RequestException as e:
             print(f"Error getting product details for ASIN {asin}: {e}")
             return None
@@ -167,7 +220,7 @@ class BookDataEnricher:
     def _download_image(self, book, image_url):
         """Download and save book cover image"""
         try:
-            response = requests.get(image_url, timeout=10)
+            response = self.amazon_matcher.session.get(image_url, timeout=10)
             response.raise_for_status()
 
             image_name = f"{book.pk}_cover.jpg"
@@ -225,3 +278,102 @@ class BookDataEnricher:
         except Exception as e:
             print(f"    Error extracting page count: {e}")
             return None
+
+
+class BookEnrichmentPipeline:
+    """
+    Enrich many books concurrently.
+
+    Each book goes through a search stage, then image download and product
+    detail stages that run in parallel with each other and with the searches
+    of later books. Workers share one rate limiter for the ASIN Data API and
+    never touch the database; the changed books are saved at the end with
+    save(update_fields=...), SAVE_BATCH_SIZE to a transaction.
+    """
+
+    def __init__(self, enricher, max_workers=DEFAULT_MAX_WORKERS):
+        self.enricher = enricher
+        self.matcher = enricher.amazon_matcher
+        self.max_workers = max_workers
+
+    @classmethod
+    def from_settings(cls, max_workers=None, requests_per_second=None):
+        max_workers = max_workers or getattr(settings, "ASINDATAAPI_MAX_WORKERS", DEFAULT_MAX_WORKERS)
+        rate_limiter = TokenBucket(
+            requests_per_second
+            or getattr(settings, "ASINDATAAPI_REQUESTS_PER_SECOND", DEFAULT_REQUESTS_PER_SECOND),
+            getattr(settings, "ASINDATAAPI_BURST", DEFAULT_BURST),
+        )
+        matcher = AmazonBookMatcher(
+            getattr(settings, "ASINDATAAPI", None), rate_limiter, max_connections=max_workers
+        )
+        return cls(BookDataEnricher(matcher), max_workers)
+
+    def _search(self, book):
+        search_results = self.matcher.search_book(book.title, str(book.author))
+        return self.matcher.find_exact_match(search_results, book.title, str(book.author))
+
+    def run(self, books):
+        """
+        Enrich the books (with authors loaded), returning a dict of counts:
+        processed, updated and errors.
+        """
+        books = iter(books)
+        changed = {}
+        errors = set()
+        processed = 0
+        pending = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def submit(stage, book, fn, *args):
+                pending[executor.submit(fn, *args)] = (stage, book)
+
+            def start_searches():
+                # Only a few searches wait in the queue, so image and detail
+                # stages of earlier books are not stuck behind the backlog
+                nonlocal processed
+                while len(pending) < self.max_workers * 2:
+                    book = next(books, None)
+                    if book is None:
+                        return
+                    processed += 1
+                    submit("search", book, self._search, book)
+
+            start_searches()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, book = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception:
+                        logger.exception("Enrichment %s stage failed for book %s", stage, book.pk)
+                        errors.add(book.pk)
+                        continue
+                    if not result:
+                        continue
+
+                    fields = changed.setdefault(book.pk, (book, set()))[1]
+                    if stage == "search":
+                        if not book.asin and result['asin']:
+                            book.asin = result['asin']
+                            fields.add("asin")
+                        if not book.image and result.get('image_url'):
+                            submit("image", book, self.enricher._download_image, book,
+                                   result['image_url'])
+                        if not book.page_count and book.asin:
+                            submit("details", book, self.enricher._get_page_count, book.asin)
+                    elif stage == "image":
+                        fields.add("image")
+                    elif stage == "details":
+                        book.page_count = result
+                        fields.add("page_count")
+                start_searches()
+
+        updated = [(book, fields) for book, fields in changed.values() if fields]
+        for start in range(0, len(updated), SAVE_BATCH_SIZE):
+            with transaction.atomic():
+                for book, fields in updated[start:start + SAVE_BATCH_SIZE]:
+                    book.save(update_fields=sorted(fields))
+
+        return {"processed": processed, "updated": len(updated), "errors": len(errors)}
@@ -0,0 +1,143 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import SEARCH_VERSION_KEY
+from .catalog import (HOMEPAGE_VERSION_KEY, bump_catalog_version, bump_category_versions,
+                      bump_version)
+from .models import Author, Book, BookCategory, Category, Illustrator
+from .progress import refresh_book_pages, refresh_list_progress
+from .search import update_search_documents
+
+
+@receiver(post_save, sender=BookCategory)
+@receiver(post_delete, sender=BookCategory)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, **kwargs):
+    """Award memberships or categories changed, so cached catalog views are stale"""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def homepage_categories_changed(sender, **kwargs):
+    bump_version(HOMEPAGE_VERSION_KEY)
+
+
+@receiver(post_save, sender=BookCategory)
+@receiver(post_delete, sender=BookCategory)
+def category_membership_changed(sender, instance, **kwargs):
+    bump_category_versions([instance.category_id])
+
+
+@receiver(post_save, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    bump_category_versions([instance.id])
+
+
+@receiver(post_save, sender=Book)
+def book_changed(sender, instance, created, **kwargs):
+    """Cached category pages show book details, so refresh the ones listing it"""
+    if not created:
+        bump_category_versions(
+            BookCategory.objects.filter(book=instance).values_list("category_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Book)
+def book_pages_changed(sender, instance, created, update_fields, **kwargs):
+    """List progress sums the pages of read books, so recount them for this one"""
+    if not created and (update_fields is None or "page_count" in update_fields):
+        refresh_book_pages(instance)
+
+
+@receiver(post_save, sender=Author)
+def author_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_category_versions(
+            BookCategory.objects.filter(book__author=instance).values_list(
+                "category_id", flat=True
+            )
+        )
+
+
+@receiver(pre_save, sender=BookCategory)
+def remember_previous_list(sender, instance, raw, **kwargs):
+    """Note which list an edited membership was on, to refresh it after the move"""
+    instance._previous_list = None
+    if instance.pk and not raw:
+        instance._previous_list = (
+            BookCategory.objects.filter(pk=instance.pk).values_list("category_id", "year").first()
+        )
+
+
+@receiver(post_save, sender=BookCategory)
+def book_added_to_list(sender, instance, created, **kwargs):
+    """Refresh the list a membership is on, and the one it left if it moved"""
+    award_list = (instance.category_id, instance.year)
+    previous = getattr(instance, "_previous_list", None)
+    if created or previous is None:
+        refresh_list_progress(*award_list)
+    elif previous != award_list:
+        refresh_list_progress(*previous)
+        refresh_list_progress(*award_list)
+
+
+@receiver(post_delete, sender=BookCategory)
+def book_removed_from_list(sender, instance, **kwargs):
+    refresh_list_progress(instance.category_id, instance.year)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Illustrator)
+def search_names_saved(sender, instance, update_fields, **kwargs):
+    """
+    Titles or names changed, so the autocomplete index is stale.
+
+    Saves that only touch other columns, such as enrichment filling in an
+    image or page count, leave the index alone.
+    """
+    if instance.search_fields_changed(update_fields):
+        bump_version(SEARCH_VERSION_KEY)
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Illustrator)
+def search_names_deleted(sender, **kwargs):
+    bump_version(SEARCH_VERSION_KEY)
+
+
+def update_search_documents_on_commit(book_ids):
+    """Refresh search documents once the surrounding transaction has committed"""
+    book_ids = list(book_ids)
+    if book_ids:
+        transaction.on_commit(lambda: update_search_documents(book_ids))
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, **kwargs):
+    update_search_documents_on_commit([instance.id])
+
+
+@receiver(post_save, sender=BookCategory)
+@receiver(post_delete, sender=BookCategory)
+def index_book_awards(sender, instance, **kwargs):
+    update_search_documents_on_commit([instance.book_id])
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Illustrator)
+def index_person_books(sender, instance, created, **kwargs):
+    if not created:
+        update_search_documents_on_commit(instance.books.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Category)
+def index_category_books(sender, instance, created, **kwargs):
+    if not created:
+        update_search_documents_on_commit(
+            BookCategory.objects.filter(category=instance).values_list("book_id", flat=True)
+        )
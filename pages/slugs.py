@@ -0,0 +1,75 @@
+import re
+
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .normalization import normalize_text_advanced
+
+PREFIX_QUERY_CHUNK = 200  # Bases per query; SQLite limits how deep a WHERE clause may nest
+
+
+def truncate_to_nearest_space(text, max_length=50):
+    """Truncate text to the nearest space not exceeding max_length characters."""
+    if len(text) <= max_length:
+        return text
+
+    # Find the last space before the max_length limit
+    last_space_pos = text[:max_length+1].rfind(' ')
+
+    # If no space found, just truncate at max_length
+    if last_space_pos == -1:
+        return text[:max_length]
+
+    return text[:last_space_pos]
+
+
+def slug_base(title, fallback="book"):
+    """The slug a title gets before any suffix is added to make it unique"""
+    return slugify(
+        truncate_to_nearest_space(normalize_text_advanced(title), 50), allow_unicode=True
+    ) or fallback
+
+
+def existing_slugs(queryset, bases, field="slug"):
+    """
+    The slugs in the table that equal one of the bases or are base-N.
+
+    Other slugs sharing a prefix, like "homer" for "home", are not loaded.
+    """
+    distinct = sorted(set(bases))
+    taken = set()
+    for start in range(0, len(distinct), PREFIX_QUERY_CHUNK):
+        matches = Q()
+        for base in distinct[start:start + PREFIX_QUERY_CHUNK]:
+            # The prefix lookup can use the slug index; the regex narrows it down
+            matches |= Q(**{field: base}) | Q(**{
+                f"{field}__startswith": f"{base}-",
+                f"{field}__regex": rf"^{re.escape(base)}-[0-9]+$",
+            })
+        taken.update(queryset.filter(matches).values_list(field, flat=True))
+    return taken
+
+
+def allocate_slugs(queryset, bases, field="slug"):
+    """
+    Reserve a unique slug for each base slug, in order.
+
+    The taken base and base-N slugs are fetched with existing_slugs(), then
+    each base gets the first of base, base-1, base-2, ... that is neither in
+    the table nor handed out earlier in the same call.
+    """
+    bases = list(bases)
+    taken = existing_slugs(queryset, bases, field)
+
+    next_suffix = {}
+    slugs = []
+    for base in bases:
+        slug = base
+        counter = next_suffix.get(base, 1)
+        while slug in taken:
+            slug = f"{base}-{counter}"
+            counter += 1
+        next_suffix[base] = counter
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
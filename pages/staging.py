@@ -0,0 +1,322 @@
+import logging
+import uuid
+
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from .autocomplete import SEARCH_VERSION_KEY
+from .catalog import bump_catalog_version, bump_category_versions, bump_version
+from .models import (Author, AwardLevel, Book, BookCategory, Category, Illustrator,
+                     ImportStagingRow)
+from .normalization import normalize_search_key
+from .progress import refresh_list_progress
+from .search import update_search_documents
+from .slugs import allocate_slugs, slug_base
+from .upload_utils import RowError, _parse_int, validate_row
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_SIZE = 1000
+
+# (staging name prefix, staging id column) for each kind of person
+PEOPLE = {Author: ("", "author_id"), Illustrator: ("illustrator_", "illustrator_id")}
+
+
+class CatalogLookup:
+    """
+    Normalized name to id maps of the catalog, shared by the batches of an import.
+
+    Each map is built from one values_list query and holds only strings and
+    ids, so a large catalog stays small in memory. Where several records
+    share a name, the oldest wins, as in the database matching.
+    """
+
+    def __init__(self, authors, illustrators, books):
+        self.ids = {Author: authors, Illustrator: illustrators, Book: books}
+
+    @classmethod
+    def build(cls):
+        def first_ids(queryset, *key_fields):
+            ids = {}
+            for *key, pk in queryset.order_by("pk").values_list(*key_fields, "pk").iterator():
+                ids.setdefault(tuple(key), pk)
+            return ids
+
+        return cls(
+            first_ids(Author.objects, "first_name_normalized", "last_name_normalized"),
+            first_ids(Illustrator.objects, "first_name_normalized", "last_name_normalized"),
+            first_ids(Book.objects, "title_normalized"),
+        )
+
+    def resolve(self, staged):
+        """Fill in the ids of staged rows whose names are already known"""
+        for row in staged:
+            if row.error:
+                continue
+            for model, (prefix, id_column) in PEOPLE.items():
+                if getattr(row, f"{prefix}first_name") and getattr(row, f"{prefix}last_name"):
+                    setattr(row, id_column, self.ids[model].get((
+                        getattr(row, f"{prefix}first_name_normalized"),
+                        getattr(row, f"{prefix}last_name_normalized"),
+                    )))
+            row.book_id = self.ids[Book].get((row.title_normalized,))
+
+    def add(self, created):
+        """Remember the people and books a committed batch created"""
+        for model, objs in created.items():
+            for obj in objs:
+                if obj.pk is None:
+                    continue  # The backend did not return ids; the database match finds them
+                if model is Book:
+                    key = (obj.title_normalized,)
+                else:
+                    key = (obj.first_name_normalized, obj.last_name_normalized)
+                self.ids[model].setdefault(key, obj.pk)
+
+
+def _stage(batch, row_num, row):
+    """Build the staging row for one parsed upload row"""
+    def text(column):
+        return (row.get(column) or "").strip()
+
+    staged = ImportStagingRow(
+        batch=batch,
+        row_num=row_num,
+        title=text("title")[:200],
+        first_name=text("first_name")[:100],
+        last_name=text("last_name")[:100],
+        illustrator_first_name=text("illustrator_first_name")[:100],
+        illustrator_last_name=text("illustrator_last_name")[:100],
+        year=_parse_int(row.get("year")),
+        category_id=_parse_int(row.get("category")),
+        level_id=_parse_int(row.get("level")),
+    )
+    staged.title_normalized = normalize_search_key(staged.title)
+    for prefix in ("", "illustrator_"):
+        for part in ("first_name", "last_name"):
+            setattr(
+                staged,
+                f"{prefix}{part}_normalized",
+                normalize_search_key(getattr(staged, f"{prefix}{part}")),
+            )
+
+    # The same checks as the upload reader; the first problem is kept for the row
+    errors = validate_row(row_num, row)
+    if errors:
+        staged.error, staged.error_column = errors[0].reason, errors[0].column
+    return staged
+
+
+def _load(staged):
+    """Insert staging rows, with COPY on PostgreSQL"""
+    if connection.vendor != "postgresql":
+        ImportStagingRow.objects.bulk_create(staged, batch_size=WRITE_BATCH_SIZE)
+        return
+
+    fields = [field for field in ImportStagingRow._meta.concrete_fields if not field.primary_key]
+    sql = "COPY {} ({}) FROM STDIN".format(
+        connection.ops.quote_name(ImportStagingRow._meta.db_table),
+        ", ".join(connection.ops.quote_name(field.column) for field in fields),
+    )
+    with connection.cursor() as cursor, cursor.copy(sql) as copy:
+        for row in staged:
+            copy.write_row([getattr(row, field.attname) for field in fields])
+
+
+def _person_match(model, prefix):
+    """The id of the first existing person with a staged row's normalized name"""
+    return Subquery(
+        model.objects.filter(
+            first_name_normalized=OuterRef(f"{prefix}first_name_normalized"),
+            last_name_normalized=OuterRef(f"{prefix}last_name_normalized"),
+        ).order_by("pk").values("pk")[:1]
+    )
+
+
+def _book_match():
+    return Subquery(
+        Book.objects.filter(title_normalized=OuterRef("title_normalized"))
+        .order_by("pk").values("pk")[:1]
+    )
+
+
+def _resolve_people(rows, model):
+    """Point staged rows at existing people, creating the missing ones in bulk"""
+    prefix, id_column = PEOPLE[model]
+    named = rows.exclude(**{f"{prefix}first_name": ""}).exclude(**{f"{prefix}last_name": ""})
+    unresolved = named.filter(**{f"{id_column}__isnull": True})
+    unresolved.update(**{id_column: _person_match(model, prefix)})
+
+    missing = {}
+    for first_name, last_name, first_normalized, last_normalized in unresolved.order_by(
+        "row_num"
+    ).values_list(
+        f"{prefix}first_name",
+        f"{prefix}last_name",
+        f"{prefix}first_name_normalized",
+        f"{prefix}last_name_normalized",
+    ):
+        missing.setdefault(
+            (first_normalized, last_normalized),
+            model(first_name=first_name, last_name=last_name),
+        )
+    if missing:
+        model.objects.bulk_create(missing.values(), batch_size=WRITE_BATCH_SIZE)
+        unresolved.update(**{id_column: _person_match(model, prefix)})
+    return list(missing.values())
+
+
+def _resolve_books(rows):
+    """Point staged rows at existing books, creating the missing ones in bulk"""
+    unresolved = rows.filter(book_id__isnull=True)
+    unresolved.update(book_id=_book_match())
+
+    missing = {}
+    for title, title_normalized, author_id, illustrator_id in unresolved.exclude(
+        author_id__isnull=True
+    ).order_by("row_num").values_list("title", "title_normalized", "author_id", "illustrator_id"):
+        if title_normalized not in missing:
+            missing[title_normalized] = Book(
+                title=title, author_id=author_id, illustrator_id=illustrator_id
+            )
+    if missing:
+        slugs = allocate_slugs(Book.objects, (slug_base(book.title) for book in missing.values()))
+        for book, slug in zip(missing.values(), slugs):
+            book.slug = slug
+        Book.objects.bulk_create(missing.values(), batch_size=WRITE_BATCH_SIZE)
+        unresolved.update(book_id=_book_match())
+
+    unresolved.update(
+        error="Book not found and no author given to create it", error_column="first_name"
+    )
+    return list(missing.values())
+
+
+def _fill_missing_illustrators(rows):
+    """Give existing books without an illustrator the one named in the upload"""
+    with_illustrator = rows.filter(illustrator_id__isnull=False)
+    book_ids = list(
+        Book.objects.filter(
+            illustrator__isnull=True, id__in=with_illustrator.values("book_id")
+        ).values_list("id", flat=True)
+    )
+    if book_ids:
+        Book.objects.filter(id__in=book_ids).update(
+            illustrator_id=Subquery(
+                with_illustrator.filter(book_id=OuterRef("pk"))
+                .order_by("row_num").values("illustrator_id")[:1]
+            )
+        )
+    return book_ids
+
+
+def _merge_memberships(rows):
+    """Upsert BookCategory rows, returning the (category, year) lists that gained books"""
+    memberships = {}
+    for book_id, category_id, year, level_id in rows.order_by("row_num").values_list(
+        "book_id", "category_id", "year", "level_id"
+    ):
+        # A later row for the same book, list and year wins, as it always has
+        memberships[(book_id, category_id, year)] = level_id
+    if not memberships:
+        return set()
+
+    existing = set(
+        BookCategory.objects.filter(
+            book_id__in={book_id for book_id, _, _ in memberships},
+            category_id__in={category_id for _, category_id, _ in memberships},
+        ).values_list("book_id", "category_id", "year")
+    )
+    BookCategory.objects.bulk_create(
+        [
+            BookCategory(
+                book_id=book_id, category_id=category_id, year=year, award_level_id=level_id
+            )
+            for (book_id, category_id, year), level_id in memberships.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["book", "category", "year"],
+        update_fields=["award_level"],
+        batch_size=WRITE_BATCH_SIZE,
+    )
+    return {
+        (category_id, year)
+        for book_id, category_id, year in memberships
+        if (book_id, category_id, year) not in existing
+    }
+
+
+def _merge(batch):
+    """
+    Merge one loaded batch into the catalog.
+
+    Returns the RowErrors of its rows and the people and books it created.
+    """
+    rows = ImportStagingRow.objects.filter(batch=batch)
+    valid = rows.filter(error="")
+
+    valid.exclude(category_id__in=Category.objects.values("id")).update(
+        error="Category does not exist", error_column="category"
+    )
+    valid.exclude(level_id__in=AwardLevel.objects.values("id")).update(
+        error="Award level does not exist", error_column="level"
+    )
+
+    created = {
+        Author: _resolve_people(valid, Author),
+        Illustrator: _resolve_people(valid, Illustrator),
+        Book: _resolve_books(valid),
+    }
+    filled_book_ids = _fill_missing_illustrators(valid)
+    new_lists = _merge_memberships(valid)
+
+    # Bulk writes skip the model signals, so do their work once for the batch
+    book_ids = set(valid.values_list("book_id", flat=True))
+    bump_catalog_version()
+    bump_category_versions(
+        BookCategory.objects.filter(book_id__in=book_ids).values_list("category_id", flat=True)
+    )
+    if any(created.values()) or filled_book_ids:
+        bump_version(SEARCH_VERSION_KEY)
+    for category_id, year in new_lists:
+        refresh_list_progress(category_id, year)
+    transaction.on_commit(lambda: update_search_documents(book_ids))
+
+    errors = [
+        RowError(*values)
+        for values in rows.exclude(error="").order_by("row_num").values_list(
+            "row_num", "error_column", "error"
+        )
+    ]
+    return errors, created
+
+
+def import_rows(rows, lookup=None):
+    """
+    Import a batch of (row_num, row) pairs from an award list upload.
+
+    The rows are loaded into the staging table and merged into authors,
+    illustrators, books and memberships with a few set-based statements.
+    Passing the same CatalogLookup for every batch of a file resolves known
+    names before loading, so only new names are matched in the database.
+    Returns (success_count, errors) where errors is a list of RowErrors.
+    """
+    batch = uuid.uuid4()
+    staged = [_stage(batch, row_num, row) for row_num, row in rows]
+    if not staged:
+        return 0, []
+    if lookup is not None:
+        lookup.resolve(staged)
+
+    try:
+        with transaction.atomic():
+            _load(staged)
+            errors, created = _merge(batch)
+            ImportStagingRow.objects.filter(batch=batch).delete()
+        if lookup is not None:
+            lookup.add(created)
+    except Exception as e:
+        logger.exception("Import batch starting at row %s failed", staged[0].row_num)
+        errors = [RowError(row.row_num, "", f"Batch failed: {e}") for row in staged]
+
+    return len(staged) - len(errors), errors
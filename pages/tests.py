@@ -1,3 +1,1235 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
 
-# Create your tests here.
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .autocomplete import get_autocomplete_index
+from .catalog import (bump_catalog_version, get_catalog_version, get_category_years,
+                      get_homepage_categories, get_membership_index, get_versioned,
+                      most_completed_books)
+from .consolidation import duplicate_clusters, merge_people
+from .imports import MAX_ATTEMPTS, STALE_AFTER, claim_next_job, run_import_job
+from .liked_lists import liked_lists_with_completion, to_read_books
+from .availability import BibliocommonsAvailabilityClient
+from .models import (Author, AwardLevel, AwardYearLike, Book, BookCategory,
+                     Category, Illustrator, ImportJob, ImportStagingRow,
+                     UserBook, UserListProgress)
+from .progress import rebuild_user_progress, reconcile_completion_counts, set_books_completed
+from .scoring import score_all_users, xp_report_for_user
+from .search import search_books
+from .services import AmazonBookMatcher, BookDataEnricher, BookEnrichmentPipeline, TokenBucket
+from .slugs import allocate_slugs, existing_slugs
+from .staging import CatalogLookup, _stage, import_rows
+from .upload_utils import RowError, UploadReader, find_author_flexible
+
+
+class BooksByCategoryViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="reader", email="reader@example.com", password="password"
+        )
+        level = AwardLevel.objects.create(name="Winner", order=1)
+        author = Author.objects.create(first_name="Kate", last_name="DiCamillo")
+        cls.lists = []
+        for category_number in range(3):
+            category = Category.objects.create(name=f"Award {category_number}")
+            for year in range(2010, 2015):
+                for book_number in range(3):
+                    book = Book.objects.create(
+                        title=f"Book {category_number}-{year}-{book_number}",
+                        author=author,
+                    )
+                    BookCategory.objects.create(
+                        book=book, category=category, year=year, award_level=level
+                    )
+                cls.lists.append((category, year))
+        UserBook.objects.create(user=cls.user, book=Book.objects.first(), completed=True)
+        rebuild_user_progress()
+
+    def like_lists(self, count):
+        for category, year in self.lists[:count]:
+            AwardYearLike.objects.get_or_create(user=self.user, category=category, year=year)
+
+    def get_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("my_books"))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_liked_lists(self):
+        self.client.force_login(self.user)
+
+        self.like_lists(2)
+        response, few_likes_queries = self.get_page()
+        self.assertEqual(
+            sum(len(years) for years in response.context["books_by_category"].values()), 2
+        )
+
+        self.like_lists(len(self.lists))
+        response, many_likes_queries = self.get_page()
+        self.assertEqual(
+            sum(len(years) for years in response.context["books_by_category"].values()),
+            len(self.lists),
+        )
+
+        self.assertEqual(few_likes_queries, many_likes_queries)
+
+    def test_liked_list_queries_do_not_grow_with_lists_or_books(self):
+        def load():
+            with self.assertNumQueries(3):
+                lists = [
+                    (like.category.name, [bc.book.author.last_name for bc in completed],
+                     [bc.book.author.last_name for bc in not_completed])
+                    for like, completed, not_completed in liked_lists_with_completion(self.user)
+                ]
+                books = [book.author.last_name for book in to_read_books(self.user)]
+            return lists, books
+
+        self.like_lists(1)
+        lists, books = load()
+        self.assertEqual((len(lists), len(books)), (1, 2))
+
+        self.like_lists(len(self.lists))
+        lists, books = load()
+        self.assertEqual((len(lists), len(books)), (len(self.lists), len(self.lists) * 3 - 1))
+
+    def test_groups_liked_lists_by_category_and_year(self):
+        self.client.force_login(self.user)
+        self.like_lists(2)
+
+        response, _ = self.get_page()
+        books_by_category = response.context["books_by_category"]
+        category = self.lists[0][0]
+        self.assertEqual(list(books_by_category[category]), [2011, 2010])
+        self.assertEqual(books_by_category[category][2010]["total_books"], 3)
+        self.assertEqual(books_by_category[category][2010]["read_books"], 1)
+
+
+class AwardYearListViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="reader", email="reader@example.com", password="password"
+        )
+        author = Author.objects.create(first_name="Kate", last_name="DiCamillo")
+        category = Category.objects.create(name="Award 0")
+        for year in range(2010, 2015):
+            for book_number in range(3):
+                book = Book.objects.create(title=f"Book {year}-{book_number}", author=author)
+                BookCategory.objects.create(book=book, category=category, year=year)
+        cls.category = category
+
+    def test_overlays_likes_on_the_cached_index(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        AwardYearLike.objects.create(user=self.user, category=self.category, year=2010)
+
+        response = self.client.get(reverse("award_year_list"))
+        awards = response.context["grouped_awards"]["Award 0"]
+        self.assertEqual([award["year"] for award in awards], [2014, 2013, 2012, 2011, 2010])
+        self.assertEqual({award["book_count"] for award in awards}, {3})
+        self.assertEqual([award["liked"] for award in awards], [False] * 4 + [True])
+
+        self.client.logout()
+        response = self.client.get(reverse("award_year_list"))
+        awards = response.context["grouped_awards"]["Award 0"]
+        self.assertFalse(any(award["liked"] for award in awards))
+
+
+class XpReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="reader", email="reader@example.com", password="password"
+        )
+        author = Author.objects.create(first_name="Kate", last_name="DiCamillo")
+        cls.books = {}
+        # Award name -> (books on its 2020 list, books the user has read)
+        for name, size, read in (("Newbery", 3, 3), ("Caldecott", 4, 2),
+                                 ("Printz", 10, 4), ("Geisel", 10, 1)):
+            category = Category.objects.create(name=name)
+            books = [
+                Book.objects.create(title=f"{name} {number}", author=author, page_count=100)
+                for number in range(size)
+            ]
+            for book in books:
+                BookCategory.objects.create(book=book, category=category, year=2020)
+            cls.books[name] = (category, books[:read])
+        for name in ("Newbery", "Caldecott"):
+            AwardYearLike.objects.create(user=cls.user, category=cls.books[name][0], year=2020)
+
+    def setUp(self):
+        cache.clear()
+        for _, read in self.books.values():
+            set_books_completed(self.user, read, True)
+
+    def test_buckets_and_points(self):
+        report = xp_report_for_user(self.user)
+
+        self.assertEqual(
+            [(data["category"], data["completion_percentage"])
+             for data in report["completed_lists"]],
+            [("Newbery", 100.0)],
+        )
+        self.assertEqual(
+            [(data["category"], data["completion_percentage"])
+             for data in report["near_complete_lists"]],
+            [("Caldecott", 50.0)],
+        )
+        # Printz is not liked and 40% read; Geisel is below the threshold
+        self.assertEqual(
+            [data["category"] for data in report["discoverable_lists"]], ["Printz"]
+        )
+        self.assertEqual(report["completed_books_count"], 10)
+        self.assertEqual(report["total_points"], 1000 + 10 * 100 + 500)
+
+    def test_query_count_does_not_grow_with_lists(self):
+        get_membership_index()
+        # Totals, progress rows, likes and the membership index version
+        with self.assertNumQueries(4):
+            xp_report_for_user(self.user)
+        with self.assertNumQueries(3):
+            score_all_users([self.user.id])
+
+        category = Category.objects.create(name="Sibert")
+        extra = Book.objects.create(title="Sibert 0", author=self.books["Newbery"][1][0].author)
+        BookCategory.objects.create(book=extra, category=category, year=2020)
+        AwardYearLike.objects.create(user=self.user, category=category, year=2020)
+        set_books_completed(self.user, [extra], True)
+        get_membership_index()
+
+        with self.assertNumQueries(4):
+            report = xp_report_for_user(self.user)
+        with self.assertNumQueries(3):
+            score_all_users([self.user.id])
+        self.assertEqual(len(report["completed_lists"]), 2)
+
+    def test_stored_progress_agrees_with_a_full_rescore(self):
+        def rescored():
+            return score_all_users([self.user.id])[self.user.id]
+
+        self.assertEqual(rescored(), xp_report_for_user(self.user))
+
+        set_books_completed(self.user, self.books["Newbery"][1][:1], False)
+        self.assertEqual(rescored(), xp_report_for_user(self.user))
+
+    def test_view_and_command(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("xp_report"))
+        self.assertEqual(response.context["total_points"], 2500)
+
+        out = io.StringIO()
+        call_command("score_users", user=["reader"], stdout=out)
+        self.assertIn(
+            "reader: 2500 XP (10 books, 1000 pages, 1 lists completed)", out.getvalue()
+        )
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    """Answers availability calls like the Bibliocommons gateway, after a delay"""
+
+    delay = 0.2
+    requested = []
+
+    def do_GET(self):
+        # Path looks like /<library_id>/bibs/<bib_id>/availability
+        bib_id = self.path.split("?")[0].split("/")[-2]
+        self.requested.append(bib_id)
+        time.sleep(5 if bib_id.startswith("slow") else self.delay)
+
+        if bib_id.startswith("missing"):
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = json.dumps(
+            {
+                "entities": {
+                    "bibItems": {
+                        f"{bib_id}-1": {
+                            "branchName": "Central",
+                            "collection": "Juvenile Fiction",
+                            "callNumber": "J FIC",
+                            "availability": {"statusType": "AVAILABLE"},
+                        },
+                        f"{bib_id}-2": {
+                            "branchName": "Northeast",
+                            "availability": {"statusType": "UNAVAILABLE"},
+                        },
+                    }
+                }
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class AvailabilityClientTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGatewayHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.gateway_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        StubGatewayHandler.requested.clear()
+
+    def test_fetches_bibs_concurrently(self):
+        client = BibliocommonsAvailabilityClient(gateway_url=self.gateway_url, max_workers=8)
+        bib_ids = [f"S1C{number}" for number in range(8)]
+
+        started = time.monotonic()
+        results = client.fetch_many("hclib", bib_ids)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(sorted(results), sorted(bib_ids))
+        self.assertEqual(
+            results["S1C0"],
+            [{"branchName": "Central", "collection": "Juvenile Fiction", "callNumber": "J FIC"}],
+        )
+        # Serially this would take 8 * 0.2 seconds
+        self.assertLess(elapsed, 4 * StubGatewayHandler.delay)
+
+    def test_returns_partial_results(self):
+        client = BibliocommonsAvailabilityClient(
+            gateway_url=self.gateway_url, request_timeout=1, total_timeout=2
+        )
+
+        results = client.fetch_many("hclib", ["S1C1", "missing1", "slow1"])
+
+        self.assertEqual(list(results), ["S1C1"])
+
+    def test_caches_results_and_not_found_bibs(self):
+        client = BibliocommonsAvailabilityClient(gateway_url=self.gateway_url)
+
+        client.fetch_many("hclib", ["S1C1", "missing1"])
+        results = client.fetch_many("hclib", ["S1C1", "missing1"])
+
+        self.assertEqual(list(results), ["S1C1"])
+        self.assertEqual(sorted(StubGatewayHandler.requested), ["S1C1", "missing1"])
+
+    def test_serves_stale_results_while_refreshing(self):
+        client = BibliocommonsAvailabilityClient(gateway_url=self.gateway_url, cache_ttl=0)
+        client.fetch_many("hclib", ["S1C1"])
+
+        started = time.monotonic()
+        with mock.patch("pages.availability.connection") as refresh_connection:
+            results = client.fetch_many("hclib", ["S1C1"])
+
+            self.assertEqual(list(results), ["S1C1"])
+            self.assertLess(time.monotonic() - started, StubGatewayHandler.delay)
+            client._refresh_executor.shutdown(wait=True)
+        self.assertEqual(StubGatewayHandler.requested, ["S1C1", "S1C1"])
+        # The refresh thread gives back its database connection
+        refresh_connection.close.assert_called_once_with()
+
+
+class SearchBooksTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author = Author.objects.create(first_name="José", last_name="Martí")
+            self.book = Book.objects.create(title="Ismaelillo", author=self.author)
+            Book.objects.create(title="Flora & Ulysses", author=Author.objects.create(
+                first_name="Kate", last_name="DiCamillo"
+            ))
+
+    def test_matches_title_and_people_ignoring_accents(self):
+        self.assertEqual(list(search_books("ismaelillo")), [self.book])
+        self.assertEqual(list(search_books("jose marti")), [self.book])
+
+    def test_documents_follow_author_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.last_name = "Perez"
+            self.author.save()
+
+        self.assertEqual(list(search_books("marti")), [])
+        self.assertEqual(list(search_books("perez")), [self.book])
+
+
+class HomepageCategoriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(
+            name="Newbery", description="Children's literature"
+        )
+        author = Author.objects.create(first_name="Kate", last_name="DiCamillo")
+        self.book = Book.objects.create(title="Flora & Ulysses", author=author)
+
+    def test_snapshot_holds_only_the_fields_the_homepage_shows(self):
+        response = self.client.get(reverse("home"))
+
+        self.assertEqual(
+            response.context["sorted_categories"],
+            [{"name": "Newbery", "slug": "newbery", "description": "Children's literature"}],
+        )
+        self.assertContains(response, reverse("category_detail", args=["newbery"]))
+
+    def test_warm_snapshot_costs_only_the_version_check(self):
+        get_homepage_categories()
+        with self.assertNumQueries(1):
+            get_homepage_categories()
+
+    def test_only_category_changes_rebuild_the_snapshot(self):
+        snapshot = get_homepage_categories()
+
+        BookCategory.objects.create(book=self.book, category=self.category, year=2014)
+        self.assertIs(get_homepage_categories(), snapshot)
+
+        self.category.description = "Distinguished children's literature"
+        self.category.save()
+        self.assertEqual(
+            get_homepage_categories()[0]["description"], "Distinguished children's literature"
+        )
+
+        Category.objects.create(name="Caldecott")
+        self.assertEqual(
+            [category["name"] for category in get_homepage_categories()], ["Caldecott", "Newbery"]
+        )
+
+
+class CategoryDetailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="reader", email="reader@example.com", password="password"
+        )
+        cls.newbery = Category.objects.create(name="Newbery")
+        cls.caldecott = Category.objects.create(name="Caldecott")
+        winner = AwardLevel.objects.create(name="Winner", order=1)
+        honor = AwardLevel.objects.create(name="Honor", order=2)
+        cls.author = Author.objects.create(first_name="Kate", last_name="DiCamillo")
+        cls.flora = Book.objects.create(title="Flora & Ulysses", author=cls.author)
+        cls.despereaux = Book.objects.create(title="The Tale of Despereaux", author=cls.author)
+        cls.wolf = Book.objects.create(
+            title="Wolf in the Snow",
+            author=Author.objects.create(first_name="Matthew", last_name="Cordell"),
+        )
+        BookCategory.objects.create(book=cls.flora, category=cls.newbery, year=2014,
+                                    award_level=winner)
+        BookCategory.objects.create(book=cls.despereaux, category=cls.newbery, year=2004,
+                                    award_level=winner)
+        BookCategory.objects.create(book=cls.wolf, category=cls.caldecott, year=2018,
+                                    award_level=honor)
+        UserBook.objects.create(user=cls.user, book=cls.flora, completed=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_groups_memberships_by_year_newest_first(self):
+        years = get_category_years(self.newbery)
+
+        self.assertEqual(
+            [(year, [bc.book.title for bc in book_categories]) for year, book_categories in years],
+            [(2014, ["Flora & Ulysses"]), (2004, ["The Tale of Despereaux"])],
+        )
+        self.assertIs(get_category_years(self.newbery), years)
+
+    def test_overlays_each_viewers_completed_books(self):
+        url = reverse("category_detail", args=[self.newbery.slug])
+
+        def completed(response):
+            return {
+                entry["book_category"].book.title: entry["completed"]
+                for entries in response.context["books_by_year"].values()
+                for entry in entries
+            }
+
+        anonymous = completed(self.client.get(url))
+        self.client.force_login(self.user)
+        reader = completed(self.client.get(url))
+
+        self.assertEqual(
+            anonymous, {"Flora & Ulysses": False, "The Tale of Despereaux": False}
+        )
+        self.assertEqual(reader, {"Flora & Ulysses": True, "The Tale of Despereaux": False})
+
+    def test_edits_invalidate_only_the_affected_categories(self):
+        newbery, caldecott = get_category_years(self.newbery), get_category_years(self.caldecott)
+
+        self.flora.title = "Flora and Ulysses"
+        self.flora.save()
+        self.assertIsNot(get_category_years(self.newbery), newbery)
+        self.assertEqual(
+            get_category_years(self.newbery)[0][1][0].book.title, "Flora and Ulysses"
+        )
+        self.assertIs(get_category_years(self.caldecott), caldecott)
+
+        newbery = get_category_years(self.newbery)
+        self.author.last_name = "Di Camillo"
+        self.author.save()
+        self.assertIsNot(get_category_years(self.newbery), newbery)
+        self.assertEqual(
+            get_category_years(self.newbery)[0][1][0].book.author.last_name, "Di Camillo"
+        )
+        self.assertIs(get_category_years(self.caldecott), caldecott)
+
+
+class CatalogVersionTests(TestCase):
+    def test_bump_from_another_process_invalidates_local_artifacts(self):
+        cache.clear()
+        builds = []
+        get_versioned("test_artifact", lambda: builds.append(1) or len(builds))
+        version = get_catalog_version()
+
+        # Another process has its own cache instance on the same backend
+        with mock.patch("pages.catalog.cache", caches.create_connection("default")):
+            bump_catalog_version()
+
+        self.assertNotEqual(get_catalog_version(), version)
+        self.assertEqual(
+            get_versioned("test_artifact", lambda: builds.append(1) or len(builds)), 2
+        )
+
+
+class AutocompleteIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(first_name="Kate", last_name="DiCamillo")
+        Book.objects.create(title="The Tale of Despereaux", author=author)
+        Book.objects.create(title="Because of Winn-Dixie", author=author)
+
+    def test_suggests_by_any_word_prefix(self):
+        results = get_autocomplete_index().suggest("dica")
+        self.assertEqual([str(author) for author in results["authors"]], ["Kate DiCamillo"])
+
+        results = get_autocomplete_index().suggest("DESP")
+        self.assertEqual([book.title for book in results["books"]], ["The Tale of Despereaux"])
+        self.assertEqual(str(results["books"][0].author), "Kate DiCamillo")
+
+    def test_answers_from_memory_until_the_catalog_changes(self):
+        get_autocomplete_index()
+        # Only the shared version counter is read; the index comes from memory
+        with self.assertNumQueries(1):
+            self.client.get(reverse("search_autocomplete"), {"q": "winn"})
+
+        Author.objects.create(first_name="Matt", last_name="de la Peña")
+        results = get_autocomplete_index().suggest("pena")
+        self.assertEqual([str(author) for author in results["authors"]], ["Matt de la Peña"])
+
+    def test_only_title_and_name_changes_rebuild_the_index(self):
+        index = get_autocomplete_index()
+        book = Book.objects.get(title="Because of Winn-Dixie")
+        book.page_count = 182
+        book.save()
+        book.save(update_fields=["page_count"])
+        author = Author.objects.get()
+        author.save()
+        self.assertIs(get_autocomplete_index(), index)
+
+        book.title = "Because of Winn Dixie"
+        book.save()
+        self.assertIsNot(get_autocomplete_index(), index)
+
+        index = get_autocomplete_index()
+        author.last_name = "Di Camillo"
+        author.save(update_fields=["last_name"])
+        self.assertIsNot(get_autocomplete_index(), index)
+
+
+class NormalizedNameTests(TestCase):
+    def test_save_and_bulk_paths_fill_normalized_columns(self):
+        author = Author.objects.create(first_name="Matt", last_name="de la Peña")
+        self.assertEqual(author.name_normalized, "matt de la pena")
+
+        Author.objects.bulk_create([Author(first_name="Zoë", last_name="Brontë")])
+        self.assertTrue(Author.objects.filter(last_name_normalized="bronte").exists())
+
+        Author.objects.filter(pk=author.pk).update(first_name="Mateo")
+        author.refresh_from_db()
+        self.assertEqual(author.first_name_normalized, "mateo")
+        self.assertEqual(author.name_normalized, "mateo de la pena")
+
+        author.last_name = "Núñez"
+        author.save(update_fields=["last_name"])
+        author.refresh_from_db()
+        self.assertEqual(author.last_name_normalized, "nunez")
+
+    def test_find_author_flexible_uses_normalized_names(self):
+        accented = Author.objects.create(first_name="Matt", last_name="de la Peña")
+        plain = Author.objects.create(first_name="Matt", last_name="de la Pena")
+
+        with self.assertNumQueries(1):
+            author, first_name, last_name = find_author_flexible(" MATT ", "De La Peña")
+        self.assertEqual((author, first_name, last_name), (accented, "MATT", "De La Peña"))
+        self.assertEqual(find_author_flexible("matt", "DE LA PENA")[0], plain)
+        self.assertIsNone(find_author_flexible("Matt", "Pena")[0])
+
+    def test_search_ignores_accents_and_case(self):
+        author = Author.objects.create(first_name="Matt", last_name="de la Peña")
+
+        response = self.client.get(reverse("search"), {"q": "DE LA PENA"})
+        self.assertEqual(list(response.context["authors"]), [author])
+        response = self.client.get(reverse("search"), {"q": "Matt De"})
+        self.assertEqual(list(response.context["authors"]), [author])
+        for query in ("pena", "Peña"):
+            response = self.client.get(reverse("search"), {"q": query})
+            self.assertEqual(list(response.context["authors"]), [author])
+
+    def test_search_matches_inside_names(self):
+        author = Author.objects.create(first_name="Kate", last_name="DiCamillo")
+        illustrator = Illustrator.objects.create(first_name="Harry", last_name="Bliss")
+
+        response = self.client.get(reverse("search"), {"q": "camillo"})
+        self.assertEqual(list(response.context["authors"]), [author])
+        response = self.client.get(reverse("search"), {"q": "LISS"})
+        self.assertEqual(list(response.context["illustrators"]), [illustrator])
+
+    def test_blank_search_matches_nobody(self):
+        Author.objects.create(first_name="Matt", last_name="de la Peña")
+
+        response = self.client.get(reverse("search"), {"q": "   "})
+        self.assertEqual(list(response.context["authors"]), [])
+        self.assertEqual(list(response.context["illustrators"]), [])
+
+
+class CompletionCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="reader", email="reader@example.com", password="password"
+        )
+        author = Author.objects.create(first_name="Kate", last_name="DiCamillo")
+        self.book = Book.objects.create(title="Flora & Ulysses", author=author)
+        self.other_book = Book.objects.create(title="Raymie Nightingale", author=author)
+        self.client.force_login(self.user)
+
+    def test_read_and_unread_update_the_counter(self):
+        self.client.post(reverse("mark_book_read", args=[self.book.id]))
+        self.client.post(reverse("mark_book_read", args=[self.book.id]))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.completion_count, 1)
+        self.assertEqual(most_completed_books(10), [self.book])
+
+        self.client.post(reverse("mark_book_unread", args=[self.book.id]))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.completion_count, 0)
+        self.assertEqual(most_completed_books(10), [])
+
+    def test_full_save_of_stale_book_keeps_the_counter(self):
+        stale = Book.objects.get(pk=self.book.pk)
+        self.client.post(reverse("mark_book_read", args=[self.book.id]))
+
+        stale.page_count = 80
+        stale.save()
+
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.page_count, self.book.completion_count), (80, 1))
+
+    def test_reconcile_fixes_drifted_counters(self):
+        UserBook.objects.create(user=self.user, book=self.book, completed=True)
+        Book.objects.filter(pk=self.other_book.pk).update(completion_count=5)
+
+        self.assertEqual(reconcile_completion_counts(), 2)
+        self.assertEqual(
+            dict(Book.objects.values_list("title", "completion_count")),
+            {"Flora & Ulysses": 1, "Raymie Nightingale": 0},
+        )
+
+
+class MarkBookReadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="reader", email="reader@example.com", password="password"
+        )
+        author = Author.objects.create(first_name="Kate", last_name="DiCamillo")
+        cls.book = Book.objects.create(title="Flora & Ulysses", author=author)
+        for number in range(5):
+            BookCategory.objects.create(
+                book=cls.book, category=Category.objects.create(name=f"Award {number}"), year=2014
+            )
+
+    def setUp(self):
+        cache.clear()
+        get_membership_index()
+        self.client.force_login(self.user)
+
+    def test_query_count_per_toggle(self):
+        # Session, user and book, then one transaction: the UserBook insert,
+        # lock and update, the counter, the book's lists and their sizes, and
+        # list progress for all of them
+        with self.assertNumQueries(13):
+            self.client.post(reverse("mark_book_read", args=[self.book.id]))
+        with self.assertNumQueries(10):
+            self.client.post(reverse("mark_book_unread", args=[self.book.id]))
+
+        self.assertFalse(UserBook.objects.get(user=self.user, book=self.book).completed)
+        self.assertEqual(
+            set(UserListProgress.objects.values_list("completed_count", flat=True)), {0}
+        )
+
+    def test_marking_read_twice_counts_once(self):
+        self.client.post(reverse("mark_book_read", args=[self.book.id]))
+        self.client.post(reverse("mark_book_read", args=[self.book.id]))
+
+        self.assertEqual(UserBook.objects.filter(completed=True).count(), 1)
+        self.assertEqual(
+            set(UserListProgress.objects.values_list("completed_count", flat=True)), {1}
+        )
+
+    def test_progress_follows_memberships_and_page_counts(self):
+        # A list the cached membership index has not seen yet
+        category = Category.objects.create(name="Late Award")
+        BookCategory.objects.bulk_create(
+            [BookCategory(book=self.book, category=category, year=2015)]
+        )
+        self.client.post(reverse("mark_book_read", args=[self.book.id]))
+        progress = UserListProgress.objects.get(user=self.user, category=category, year=2015)
+        self.assertEqual((progress.completed_count, progress.total_books), (1, 1))
+
+        self.book.page_count = 240
+        self.book.save(update_fields=["page_count"])
+        self.assertEqual(
+            set(UserListProgress.objects.values_list("pages_read", flat=True)), {240}
+        )
+
+    def test_moving_or_removing_a_membership_refreshes_both_lists(self):
+        self.client.post(reverse("mark_book_read", args=[self.book.id]))
+        membership = BookCategory.objects.filter(book=self.book).first()
+        category = membership.category
+
+        membership.year = 2015
+        membership.save()
+        self.assertEqual(
+            list(UserListProgress.objects.filter(category=category)
+                 .values_list("year", "completed_count", "total_books")),
+            [(2015, 1, 1)],
+        )
+
+        membership.delete()
+        self.assertFalse(UserListProgress.objects.filter(category=category).exists())
+
+    def test_toggle_reads_state_inside_the_write(self):
+        url = reverse("toggle_read_status_htmx", args=[self.book.id])
+        self.assertTrue(self.client.post(url).context["completed"])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.completion_count, 1)
+
+        self.assertFalse(self.client.post(url).context["completed"])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.completion_count, 0)
+        self.assertEqual(
+            set(UserListProgress.objects.values_list("completed_count", flat=True)), {0}
+        )
+
+
+class MarkListReadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="reader", email="reader@example.com", password="password"
+        )
+        author = Author.objects.create(first_name="Kate", last_name="DiCamillo")
+        cls.category = Category.objects.create(name="Newbery")
+        cls.books = []
+        for number in range(30):
+            book = Book.objects.create(title=f"Book {number:02}", author=author, page_count=100)
+            BookCategory.objects.create(book=book, category=cls.category, year=2014)
+            cls.books.append(book)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse("mark_list_read", args=[self.category.id, 2014])
+
+    def progress(self):
+        return UserListProgress.objects.values_list("completed_count", "pages_read").get(
+            user=self.user, category=self.category, year=2014
+        )
+
+    def test_marks_whole_list_with_constant_queries(self):
+        self.client.post(
+            self.url, {"completed": "true", "scope": "selected", "book_ids": [self.books[0].id]}
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {"completed": "true", "scope": "all"})
+
+        self.assertLess(len(queries), 20)
+        self.assertEqual(UserBook.objects.filter(user=self.user, completed=True).count(), 30)
+        self.assertEqual(self.progress(), (30, 3000))
+        self.assertEqual(
+            set(Book.objects.values_list("completion_count", flat=True)), {1}
+        )
+        self.assertContains(response, f'id="list-{self.category.id}-2014"')
+        self.assertContains(response, "Mark as\n            Unread", count=30)
+
+    def test_marks_selected_books_unread_and_renders_my_books_fragment(self):
+        self.client.post(self.url, {"completed": "true", "scope": "all"})
+        response = self.client.post(
+            self.url,
+            {
+                "completed": "false",
+                "scope": "selected",
+                "book_ids": [book.id for book in self.books[:10]],
+                "fragment": "my_books",
+            },
+        )
+
+        self.assertEqual(self.progress(), (20, 2000))
+        self.assertEqual(response.context["data"]["read_books"], 20)
+        self.assertEqual(response.context["data"]["total_books"], 30)
+        self.assertContains(response, "66% Complete")
+
+    def test_empty_selection_changes_nothing(self):
+        response = self.client.post(self.url, {"completed": "true", "scope": "selected"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UserBook.objects.filter(user=self.user).exists())
+
+    def test_rejects_unknown_completed_or_scope(self):
+        for data in (
+            {"completed": "yes", "scope": "all"},
+            {"completed": "false"},
+        ):
+            self.assertEqual(self.client.post(self.url, data).status_code, 400)
+        self.assertFalse(UserBook.objects.filter(user=self.user).exists())
+
+
+class ConsolidationTests(TestCase):
+    def test_duplicate_clusters(self):
+        people = [
+            (1, "matt", "de la pena"),
+            (2, "matt", "de la pena"),
+            (3, "mat", "de la pena"),
+            (4, "kate", "dicamillo"),
+            (5, "kate", "dicamilo"),
+            (6, "dicamillo", "kate"),
+            (7, "kate", "messner"),
+            (8, "jason", "reynolds"),
+        ]
+        self.assertEqual(duplicate_clusters(people), [[1, 2, 3], [4, 5, 6]])
+
+    def test_merge_moves_books_with_one_update(self):
+        primary = Illustrator.objects.create(first_name="Christian", last_name="Robinson")
+        duplicates = [
+            Illustrator.objects.create(first_name="Christian", last_name="Robinsón"),
+            Illustrator.objects.create(first_name="Cristian", last_name="Robinson"),
+        ]
+        author = Author.objects.create(first_name="Matt", last_name="de la Peña")
+        for number, illustrator in enumerate(duplicates * 2):
+            Book.objects.create(title=f"Book {number}", author=author, illustrator=illustrator)
+
+        self.assertEqual(merge_people(Illustrator, primary, duplicates), 4)
+        self.assertEqual(primary.books.count(), 4)
+        self.assertEqual(list(Illustrator.objects.all()), [primary])
+
+    def test_consolidate_view_reports_moved_books(self):
+        user = get_user_model().objects.create_user(
+            username="editor", email="editor@example.com", password="password"
+        )
+        self.client.force_login(user)
+        primary = Author.objects.create(first_name="Kate", last_name="DiCamillo")
+        duplicate = Author.objects.create(first_name="Kate", last_name="Dicamilo")
+        Book.objects.create(title="Flora & Ulysses", author=duplicate)
+
+        response = self.client.post(
+            reverse("author_consolidate_process"),
+            {"primary_author": primary.id, "secondary_author": [duplicate.id]},
+            follow=True,
+        )
+
+        self.assertContains(response, "1 books were updated")
+        self.assertFalse(Author.objects.filter(pk=duplicate.pk).exists())
+
+
+class ImportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="uploader", email="uploader@example.com", password="password"
+        )
+        cls.category = Category.objects.create(name="Caldecott")
+        cls.level = AwardLevel.objects.create(name="Winner", order=1)
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        # Keep uploads on local disk instead of S3
+        patcher = mock.patch.object(
+            ImportJob._meta.get_field("file"), "storage", FileSystemStorage(location=media_root)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.user)
+
+    def upload(self, rows):
+        lines = ["title\tfirst_name\tlast_name\tyear\tcategory\tlevel"] + [
+            "\t".join(row) for row in rows
+        ]
+        tsv = SimpleUploadedFile("awards.tsv", "\n".join(lines).encode("utf-8"))
+        return self.client.post(reverse("upload_book_categories"), {"csv_file": tsv})
+
+    def test_upload_is_queued_then_processed_by_worker(self):
+        category, level = str(self.category.id), str(self.level.id)
+        response = self.upload([
+            ("Hello Lighthouse", "Sophie", "Blackall", "2019", category, level),
+            ("Wolf in the Snow", "Matthew", "Cordell", "2018", category, level),
+        ])
+
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, reverse("import_job_detail", args=[job.id]))
+        self.assertEqual(job.status, ImportJob.QUEUED)
+        self.assertFalse(BookCategory.objects.exists())
+
+        progress = self.client.get(reverse("import_job_progress", args=[job.id]))
+        self.assertContains(progress, 'hx-trigger="every 2s"')
+
+        run_import_job(claim_next_job())
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, ImportJob.SUCCEEDED)
+        self.assertEqual((job.total_rows, job.processed_rows, job.error_count), (2, 2, 0))
+        self.assertEqual(job.percent_complete, 100)
+        self.assertEqual(BookCategory.objects.filter(category=self.category).count(), 2)
+        self.assertIsNone(claim_next_job())
+
+        progress = self.client.get(reverse("import_job_progress", args=[job.id]))
+        self.assertNotContains(progress, "hx-trigger")
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        category, level = str(self.category.id), str(self.level.id)
+        self.upload([
+            ("Hello Lighthouse", "Sophie", "Blackall", "2019", "999", level),
+            ("Wolf in the Snow", "Matthew", "Cordell", "2018", category, level),
+        ])
+
+        job = run_import_job(claim_next_job())
+
+        self.assertEqual(job.status, ImportJob.SUCCEEDED)
+        self.assertEqual(job.error_count, 1)
+        self.assertEqual(
+            list(job.row_errors.values_list("row", "column", "reason")),
+            [(1, "category", "Category ID 999 does not exist")],
+        )
+        self.assertEqual(list(BookCategory.objects.values_list("book__title", flat=True)),
+                         ["Wolf in the Snow"])
+
+        response = self.client.get(reverse("import_job_errors", args=[job.id]))
+        self.assertEqual(response["Content-Type"], "text/tab-separated-values")
+        self.assertEqual(
+            b"".join(response.streaming_content).decode().splitlines(),
+            ["row\tcolumn\treason", "1\tcategory\tCategory ID 999 does not exist"],
+        )
+
+    def test_references_are_checked_once_per_table(self):
+        category, level = str(self.category.id), str(self.level.id)
+        lines = ["title\tfirst_name\tlast_name\tyear\tcategory\tlevel"] + [
+            f"Book {number}\tA\tB\t{1800 + number}\t{category if number % 2 else 999}\t{level}"
+            for number in range(300)
+        ]
+        reader = UploadReader(io.BytesIO("\n".join(lines).encode()))
+
+        with CaptureQueriesContext(connection) as queries:
+            batches = list(reader.batches(1000))
+
+        self.assertEqual(len(queries), 2)
+        errors = [error for _, _, row_errors in batches[0] for error in row_errors]
+        self.assertEqual(len(errors), 150 + 69)  # Unknown category, plus years after 2030
+        self.assertEqual(str(errors[0]), "Row 1: Category ID 999 does not exist")
+
+    def test_missing_columns_fail_job(self):
+        tsv = SimpleUploadedFile("awards.tsv", b"title\tyear\nHello Lighthouse\t2019\n")
+        self.client.post(reverse("upload_book_categories"), {"csv_file": tsv})
+
+        job = run_import_job(claim_next_job())
+
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertEqual(
+            job.errors, ["Missing required columns: first_name, last_name, category, level"]
+        )
+
+    def test_stale_jobs_are_retried_then_failed(self):
+        self.upload([("Hello Lighthouse", "Sophie", "Blackall", "2019", "1", "1")])
+        job = ImportJob.objects.get()
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.assertEqual(claim_next_job(), job)
+            # The worker dies without reporting progress
+            ImportJob.objects.filter(pk=job.pk).update(
+                heartbeat_at=timezone.now() - STALE_AFTER - timedelta(seconds=1)
+            )
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempt)
+
+        self.assertIsNone(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertEqual(
+            job.errors, [f"The worker stopped responding on each of {MAX_ATTEMPTS} attempts"]
+        )
+
+    def test_jobs_are_private_to_their_uploader(self):
+        self.upload([("Hello Lighthouse", "Sophie", "Blackall", "2019", "1", "1")])
+        other = get_user_model().objects.create_user(
+            username="other", email="other@example.com", password="password"
+        )
+        self.client.force_login(other)
+
+        response = self.client.get(reverse("import_job_detail", args=[ImportJob.objects.get().id]))
+
+        self.assertEqual(response.status_code, 404)
+
+
+class StagingImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Caldecott")
+        cls.winner = AwardLevel.objects.create(name="Winner", order=1)
+        cls.honor = AwardLevel.objects.create(name="Honor", order=2)
+        cls.author = Author.objects.create(first_name="José", last_name="Peña")
+        cls.book = Book.objects.create(title="Last Stop on Market Street", author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def row(self, title, first_name, last_name, level, year="2016", category=None, **extra):
+        return {
+            "title": title,
+            "first_name": first_name,
+            "last_name": last_name,
+            "year": year,
+            "category": str(category or self.category.id),
+            "level": str(level.id),
+            **extra,
+        }
+
+    def test_merges_batch_and_reports_row_errors(self):
+        reader = get_user_model().objects.create_user(
+            username="reader", email="reader@example.com", password="password"
+        )
+        UserBook.objects.create(user=reader, book=self.book, completed=True)
+        rows = [
+            self.row("Last Stop on Market Street", "Jose", "Pena", self.honor,
+                     illustrator_first_name="Christian", illustrator_last_name="Robinson"),
+            self.row("Finding Winnie", "Sophie", "Blackall", self.winner),
+            self.row("Finding Winnie", "Sophie", "Blackall", self.winner, year="2017"),
+            self.row("Waiting", "Kevin", "Henkes", self.honor, category=999),
+            self.row("Last Stop on Market Street", "José", "Peña", self.winner),
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            success, errors = import_rows(enumerate(rows, 1))
+
+        self.assertEqual(success, 4)
+        self.assertEqual(errors, [RowError(4, "category", "Category does not exist")])
+        self.assertEqual(Author.objects.filter(last_name_normalized="pena").count(), 1)
+        self.assertEqual(Book.objects.filter(title="Finding Winnie").count(), 1)
+        self.assertFalse(Book.objects.filter(title="Waiting").exists())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.illustrator.full_name, "Christian Robinson")
+        # The later row for the same book and year wins
+        self.assertEqual(
+            BookCategory.objects.get(book=self.book, year=2016).award_level, self.winner
+        )
+        self.assertEqual(BookCategory.objects.filter(book__title="Finding Winnie").count(), 2)
+        self.assertEqual(
+            UserListProgress.objects.get(user=reader, category=self.category, year=2016)
+            .completed_count,
+            1,
+        )
+        self.assertEqual(search_books("winnie")[0].title, "Finding Winnie")
+        self.assertFalse(ImportStagingRow.objects.exists())
+
+    def test_rows_get_the_upload_validation(self):
+        rows = [
+            self.row("Finding Winnie", "Sophie", "Blackall", self.winner, year="1700"),
+            self.row("Finding Winnie", "Sophie", "Blackall", self.winner,
+                     illustrator_first_name="Christian"),
+        ]
+
+        success, errors = import_rows(enumerate(rows, 1))
+
+        self.assertEqual(success, 0)
+        self.assertEqual(
+            [(error.row, error.column) for error in errors],
+            [(1, "year"), (2, "illustrator_last_name")],
+        )
+        self.assertFalse(Book.objects.filter(title="Finding Winnie").exists())
+
+    def test_lookup_is_shared_across_batches(self):
+        lookup = CatalogLookup.build()
+        self.assertEqual(lookup.ids[Author], {("jose", "pena"): self.author.id})
+
+        import_rows([(1, self.row("Finding Winnie", "Sophie", "Blackall", self.winner))], lookup)
+        winnie = Book.objects.get(title="Finding Winnie")
+        self.assertEqual(lookup.ids[Book][("finding winnie",)], winnie.id)
+
+        staged = _stage(None, 2, self.row("FINDING WINNIE", "Sophie", "Blackall", self.honor))
+        lookup.resolve([staged])
+        self.assertEqual((staged.book_id, staged.author_id), (winnie.id, winnie.author_id))
+
+        success, errors = import_rows(
+            [(2, self.row("FINDING WINNIE", "Sophie", "Blackall", self.honor, year="2017"))],
+            lookup,
+        )
+
+        self.assertEqual((success, errors), (1, []))
+        self.assertEqual(Book.objects.filter(title_normalized="finding winnie").count(), 1)
+
+
+class UploadReaderTests(SimpleTestCase):
+    def test_streams_rows_across_chunk_boundaries(self):
+        lines = ["title\tfirst_name\tlast_name\tyear\tcategory\tlevel"] + [
+            f"Éclair {number}\tZoë\tBrontë\t2019\t1\t1" for number in range(50)
+        ]
+        data = "\ufeff" + "\r\n".join(lines) + "\r\n"
+        reader = UploadReader(io.BytesIO(data.encode("utf-8")), chunk_size=7)
+
+        reader.check_header()
+        rows = list(reader.reader)
+
+        self.assertEqual(len(rows), 50)
+        self.assertEqual(rows[0]["title"], "Éclair 0")
+        self.assertEqual(rows[49]["last_name"], "Brontë")
+        self.assertEqual(reader.bytes_read, len(data.encode("utf-8")))
+
+
+class SlugAllocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name="Kevin", last_name="Henkes")
+        for slug in ("home", "home-1", "home-alone", "hello-3"):
+            Book.objects.create(title=slug, slug=slug, author=cls.author)
+
+    def test_allocates_batch_in_one_query(self):
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs(Book.objects, ["home", "hello", "home", "home-alone", "hello"])
+
+        self.assertEqual(slugs, ["home-2", "hello", "home-3", "home-alone-1", "hello-1"])
+
+    def test_only_loads_suffixed_copies_of_each_base(self):
+        Book.objects.create(title="Homer", slug="homer-2", author=self.author)
+
+        self.assertEqual(existing_slugs(Book.objects, ["home"]), {"home", "home-1"})
+
+    def test_book_save_keeps_title_and_author_slugs(self):
+        book = Book.objects.create(title="Home!", author=self.author)
+        self.assertEqual(book.slug, "home-kevin-henkes")
+
+        book = Book.objects.create(title="Home", author=self.author)
+        self.assertEqual(book.slug, "home-kevin-henkes-1")
+
+
+class StubAsinDataHandler(BaseHTTPRequestHandler):
+    """Answers search, product and image requests like the ASIN Data API and Amazon"""
+
+    delay = 0.2
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        path, _, query = self.path.partition("?")
+        if path.startswith("/images/"):
+            self._send(b"\xff\xd8fake-jpeg", "image/jpeg")
+            return
+
+        params = dict(parse_qsl(query))
+        if params["type"] == "search":
+            title = params["search_term"].rsplit(" ", 2)[0]
+            body = {
+                "search_results": [{
+                    "title": title,
+                    "asin": f"ASIN-{title.split()[-1]}",
+                    "price": {"name": "Paperback"},
+                    "image": f"http://{self.headers['Host']}/images/{title.split()[-1]}.jpg",
+                }]
+            }
+        else:
+            body = {"product": {"specifications_flat": "Paperback: 48 pages"}}
+        self._send(json.dumps(body).encode(), "application/json")
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EnrichmentPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubAsinDataHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        patcher = mock.patch.object(
+            Book._meta.get_field("image"), "storage", FileSystemStorage(location=media_root)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+        started = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.24)
+
+    def test_enriches_books_concurrently_and_saves_changed_fields(self):
+        author = Author.objects.create(first_name="Mo", last_name="Willems")
+        for number in range(8):
+            Book.objects.create(title=f"Pigeon Book {number}", author=author)
+        matcher = AmazonBookMatcher("key", TokenBucket(rate=100, capacity=10))
+        matcher.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/request"
+        pipeline = BookEnrichmentPipeline(BookDataEnricher(matcher), max_workers=8)
+
+        started = time.monotonic()
+        counts = pipeline.run(Book.objects.select_related("author"))
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(counts, {"processed": 8, "updated": 8, "errors": 0})
+        # 24 calls of 0.2s each; serially that would take 4.8s
+        self.assertLess(elapsed, 2)
+        book = Book.objects.get(title="Pigeon Book 3")
+        self.assertEqual((book.asin, book.page_count), ("ASIN-3", 48))
+        self.assertTrue(book.image.name.startswith("book_images/"))
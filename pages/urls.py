@@ -12,6 +12,11 @@ urlpatterns = [
     path("privacy-policy/", views.privacy_policy, name="privacy_policy"),
     path("categories/<slug:slug>/", views.category_detail, name="category_detail"),
     path("books/mark_read/<int:book_id>/", views.mark_book_read, name="mark_book_read"),
+    path(
+        "lists/<int:category_id>/<int:year>/mark_read/",
+        views.mark_list_read,
+        name="mark_list_read",
+    ),
     path(
         "books/mark_unread/<int:book_id>/",
         views.mark_book_unread,
@@ -90,6 +95,17 @@ urlpatterns = [
         views.upload_book_categories,
         name="upload_book_categories",
     ),
+    path("data/imports/<int:job_id>/", views.import_job_detail, name="import_job_detail"),
+    path(
+        "data/imports/<int:job_id>/progress/",
+        views.import_job_progress,
+        name="import_job_progress",
+    ),
+    path(
+        "data/imports/<int:job_id>/errors.tsv",
+        views.import_job_errors,
+        name="import_job_errors",
+    ),
     path("books/<int:pk>/lookup/", views.lookup_book, name="lookup_book"),
     path(
         "books/<int:pk>/update-from-api/",
@@ -4,6 +4,7 @@ import os
 import re
 import uuid
 from collections import defaultdict
+from itertools import chain
 
 import logging
 import traceback
@@ -17,9 +18,9 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.mail import send_mail
 from django.core.paginator import Paginator
-from django.db import transaction, models
-from django.db.models import Count, Q, Sum
-from django.http import HttpResponse, JsonResponse
+from django.db import models
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import Http404, get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import path, reverse
@@ -29,34 +30,40 @@ from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.views.generic import TemplateView
-from django.core.cache import cache
-from django.views.decorators.cache import cache_page
 
 import unicodedata
-import unidecode
-
-import time
 
 import urllib.parse
 import urllib.request
 import xml.etree.ElementTree as ET
 from django.views.decorators.http import require_http_methods
 
-from .services import AmazonBookMatcher, BookDataEnricher#, get_books_needing_enrichment
+from .autocomplete import get_autocomplete_index
+from .availability import get_availability_client
+from .catalog import (
+    get_award_year_index,
+    get_category_years,
+    get_homepage_categories,
+    most_completed_books,
+)
+from .consolidation import load_duplicate_clusters, merge_people
+from .imports import enqueue_import
+from .liked_lists import (
+    group_liked_memberships,
+    liked_lists_with_completion,
+    to_read_books,
+)
+from .normalization import normalize_search_key
+from .progress import (get_user_progress, set_book_completed, set_books_completed,
+                       toggle_book_completed)
+from .scoring import xp_report_for_user
+from .search import search_books
+from .services import AmazonBookMatcher, BookDataEnricher, BookEnrichmentPipeline#, get_books_needing_enrichment
 
 
 from .forms import BookCategoryForm
-from .models import (Author, AwardLevel, AwardYearLike, Book, BookCategory,
-                     Category, Illustrator, Library, UserBook,
-                     UserBookCategory, UserFavoriteLibrary)
-
-from .upload_utils import (
-    validate_upload_file,
-    cache_existing_books,
-    cache_existing_authors,
-    cache_existing_illustrators,
-    process_batch
-)
+from .models import (Author, AwardYearLike, Book, BookCategory, Category,
+                     Illustrator, ImportJob, Library, UserBook, UserFavoriteLibrary)
 
 logger = logging.getLogger(__name__)
 
@@ -76,11 +83,6 @@ def profile_view(request):
 
 def category_detail(request, slug):
     category = get_object_or_404(Category, slug=slug)
-    books = (
-        BookCategory.objects.filter(category=category)
-        .select_related("book", "award_level")
-        .order_by("-year","award_level")
-    )
 
     # Get the UserBook objects for the current user
     user_completed_books = set()
@@ -91,19 +93,21 @@ def category_detail(request, slug):
             )
         )
 
-    books_by_year = defaultdict(list)
-    for book_category in books:
-        if book_category.id and book_category.book:
-            books_by_year[book_category.year].append(
-                {
-                    "book_category": book_category,
-                    "completed": book_category.book.id in user_completed_books,
-                }
-            )
+    # Overlay the user's completed books on the cached, shared grouping
+    books_by_year = {
+        year: [
+            {
+                "book_category": book_category,
+                "completed": book_category.book_id in user_completed_books,
+            }
+            for book_category in book_categories
+        ]
+        for year, book_categories in get_category_years(category)
+    }
 
     context = {
         "category": category,
-        "books_by_year": dict(books_by_year),
+        "books_by_year": books_by_year,
     }
     return render(request, "pages/category_detail.html", context)
 
@@ -111,16 +115,7 @@ def category_detail(request, slug):
 @login_required
 def mark_book_read(request, book_id):
     book = get_object_or_404(Book, id=book_id)
-    UserBook.objects.get_or_create(
-        user=request.user, book=book, defaults={"completed": True}
-    )
-
-    # Also mark the UserBookCategory as completed if it exists
-    book_categories = BookCategory.objects.filter(book=book)
-    for book_category in book_categories:
-        UserBookCategory.objects.get_or_create(
-            user=request.user, book_category=book_category, defaults={"completed": True}
-        )
+    set_book_completed(request.user, book, True)
 
     html = render_to_string(
         "pages/partials/book_read_button.html",
@@ -133,13 +128,7 @@ def mark_book_read(request, book_id):
 @login_required
 def mark_book_unread(request, book_id):
     book = get_object_or_404(Book, id=book_id)
-    UserBook.objects.filter(user=request.user, book=book).delete()
-
-    # Also mark the UserBookCategory as not completed
-    book_categories = BookCategory.objects.filter(book=book)
-    UserBookCategory.objects.filter(
-        user=request.user, book_category__in=book_categories
-    ).update(completed=False)
+    set_book_completed(request.user, book, False)
 
     html = render_to_string(
         "pages/partials/book_read_button.html",
@@ -149,43 +138,85 @@ def mark_book_unread(request, book_id):
     return HttpResponse(html)
 
 
-def completed_books_lookup(books_to_list):
-    cache_key = f'completed_books_{books_to_list}'
-    result = cache.get(cache_key)
+@login_required
+@require_POST
+def mark_list_read(request, category_id, year):
+    """
+    Mark a whole award list (scope=all) or the book_ids selected on it
+    (scope=selected) read (completed=true) or unread (completed=false).
 
-    if result is None:
-        result = list(
-            Book.objects.filter(userbook__isnull=False)
-            .annotate(user_count=Count('userbook'))
-            .order_by('-user_count')[:books_to_list]
-        )
-        # Cache for 1 hour
-        cache.set(cache_key, result, 3600)
+    Returns the list's re-rendered fragment for category_detail, or for the
+    my books page when fragment=my_books. A selection with no books changes
+    nothing.
+    """
+    completed = request.POST.get("completed")
+    scope = request.POST.get("scope")
+    if completed not in ("true", "false") or scope not in ("all", "selected"):
+        return HttpResponse("completed must be true or false and scope all or selected", status=400)
 
-    return result
+    category = get_object_or_404(Category, id=category_id)
+    book_categories = dict(get_category_years(category)).get(year)
+    if book_categories is None:
+        raise Http404("No such award list")
+
+    books = [book_category.book for book_category in book_categories]
+    if scope == "selected":
+        selected = {
+            int(book_id) for book_id in request.POST.getlist("book_ids") if book_id.isdigit()
+        }
+        books = [book for book in books if book.id in selected]
+    if books:
+        set_books_completed(request.user, books, completed == "true")
 
+    user_completed_books = set(
+        UserBook.objects.filter(
+            user=request.user,
+            completed=True,
+            book_id__in=[book_category.book_id for book_category in book_categories],
+        ).values_list("book_id", flat=True)
+    )
 
-@cache_page(60 * 60)  # Cache for an hour
-def most_completed_books_view(request):
-    most_completed_books = completed_books_lookup(100)
-    return render(request, 'pages/most_completed_books.html', {'most_completed_books': most_completed_books})
+    if request.POST.get("fragment") == "my_books":
+        context = {
+            "category": category,
+            "year": year,
+            "data": {
+                "total_books": len(book_categories),
+                "read_books": len(user_completed_books),
+                "book_list": sorted(
+                    book_categories, key=lambda book_category: book_category.book.title
+                ),
+            },
+            "user_completed_books": user_completed_books,
+        }
+        return render(request, "pages/partials/my_books_year.html", context)
 
-@cache_page(60 * 360)
-def category_list_sorted_by_year(request):
-    categories = Category.objects.all().prefetch_related(
-        "bookcategory_set__book", "bookcategory_set__award_level"
+    context = {
+        "category": category,
+        "year": year,
+        "book_categories": [
+            {
+                "book_category": book_category,
+                "completed": book_category.book_id in user_completed_books,
+            }
+            for book_category in book_categories
+        ],
+    }
+    return render(request, "pages/partials/category_year_table.html", context)
+
+
+def most_completed_books_view(request):
+    return render(
+        request,
+        'pages/most_completed_books.html',
+        {'most_completed_books': most_completed_books(100)},
     )
-    completed_books = completed_books_lookup(10)
 
-    # Organize categories by year in descending order
-    sorted_categories = {}
-    for category in categories:
-        book_categories = category.bookcategory_set.all().order_by("-year")
-        sorted_categories[category] = book_categories
 
+def category_list_sorted_by_year(request):
     context = {
-        "sorted_categories": sorted_categories,
-        "completed_books": completed_books
+        "sorted_categories": get_homepage_categories(),
+        "completed_books": most_completed_books(10),
     }
 
     return render(request, "pages/homepage.html", context)
@@ -196,20 +227,8 @@ def book_detail(request, book_slug):
     categories = BookCategory.objects.filter(book=book).select_related(
         "category", "award_level"
     )
-    user_book_categories = (
-        UserBookCategory.objects.filter(
-            user=request.user, book_category__in=categories
-        ).values_list("book_category_id", flat=True)
-        if request.user.is_authenticated
-        else []
-    )
     libraries = Library.objects.all()
-
-    # Precompute completed status for the first category
     first_category = categories[0] if categories else None
-    first_category_completed = (
-        first_category.id in user_book_categories if first_category else False
-    )
 
     favorite_libraries = []
     other_libraries = []
@@ -231,6 +250,12 @@ def book_detail(request, book_slug):
         other_libraries = Library.objects.all()
         user_book = None
 
+    # Read state is per book, so the book's lists are all completed or none are
+    user_book_categories = (
+        [category.id for category in categories] if user_book and user_book.completed else []
+    )
+    first_category_completed = bool(first_category and user_book_categories)
+
     context = {
         "book": book,
         "categories": categories,
@@ -251,20 +276,7 @@ def toggle_read_status(request, book_category_id):
     data = json.loads(request.body)
     completed = data.get("completed", False)
 
-    # Update or create both UserBook and UserBookCategory
-    user_book, _ = UserBook.objects.get_or_create(
-        user=request.user, book=book_category.book, defaults={"completed": completed}
-    )
-    user_book.completed = completed
-    user_book.save()
-
-    user_book_category, _ = UserBookCategory.objects.get_or_create(
-        user=request.user,
-        book_category=book_category,
-        defaults={"completed": completed},
-    )
-    user_book_category.completed = completed
-    user_book_category.save()
+    set_book_completed(request.user, book_category.book, completed)
 
     return JsonResponse({"completed": completed})
 
@@ -272,15 +284,12 @@ def toggle_read_status(request, book_category_id):
 @login_required
 def toggle_read_status_htmx(request, book_id):
     book = get_object_or_404(Book, id=book_id)
-    user_book, created = UserBook.objects.get_or_create(user=request.user, book=book)
-    user_book.completed = not user_book.completed
-    user_book.save()
+    completed = toggle_book_completed(request.user, book)
 
     context = {
         "book": book,
-        "completed": user_book.completed,
+        "completed": completed,
     }
-    print("Rendering response with completed =", context["completed"])
 
     return render(request, "pages/partials/book_read_button.html", context)
 
@@ -298,43 +307,21 @@ class BooksByCategoryView(LoginRequiredMixin, TemplateView):
                 "book_id", flat=True
             )
         )
-        # Filter categories based on AwardYearLike for the user
-        liked_awards = AwardYearLike.objects.filter(user=user)
-        categories = Category.objects.filter(
-            id__in=liked_awards.values_list("category_id", flat=True)
-        ).order_by("name")
+        # Per-list read counts come from the stored progress rows
+        list_progress = get_user_progress(user)
 
         books_by_category = {}
-        for category in categories:
+        for category, lists in group_liked_memberships(user).items():
             books_by_year = {}
-
-            # Filter BookCategory to only include years liked by the user
-            liked_years = liked_awards.filter(category=category).values_list(
-                "year", flat=True
-            )
-            book_categories = (
-                BookCategory.objects.filter(category=category, year__in=liked_years)
-                .select_related("book", "book__author", "award_level")
-                .order_by("-year", "book__title")
-            )
-
-            # Group by year
-            for book_category in book_categories:
-                year = book_category.year
-                if year not in books_by_year:
-                    books_by_year[year] = {
-                        "total_books": 0,
-                        "read_books": 0,
-                        "book_list": [],
-                    }
-
-                books_by_year[year]["total_books"] += 1
-                if book_category.book.id in user_completed_books:
-                    books_by_year[year]["read_books"] += 1
-                books_by_year[year]["book_list"].append(book_category)
-
-            if books_by_year:
-                books_by_category[category] = books_by_year
+            for year, book_list in lists.items():
+                progress = list_progress.get((category.id, year))
+                books_by_year[year] = {
+                    # Lists the user hasn't read anything from have no progress row yet
+                    "total_books": progress.total_books if progress else len(book_list),
+                    "read_books": progress.completed_count if progress else 0,
+                    "book_list": book_list,
+                }
+            books_by_category[category] = books_by_year
 
         context["books_by_category"] = books_by_category
         context["user_completed_books"] = user_completed_books
@@ -421,39 +408,26 @@ def privacy_policy(request):
 
 
 def award_year_list(request):
-    # Retrieve distinct category-year combinations
-    award_years = (
-        BookCategory.objects.values(
-            "category", "category__name", "category__slug", "category__id", "year"
-        )
-        .distinct()
-        .order_by(
-            "category__name", "-year"
-        )  # Sort by category name first, then by year descending
-    )
-
     liked_award_set = set()
     if request.user.is_authenticated:
-        liked_awards = AwardYearLike.objects.filter(user=request.user).values_list(
-            "category_id", "year"
+        liked_award_set = set(
+            AwardYearLike.objects.filter(user=request.user).values_list(
+                "category_id", "year"
+            )
         )
-        liked_award_set = {(like[0], like[1]) for like in liked_awards}
 
-    # Group awards by category name, also store the category slug
-    grouped_awards = defaultdict(list)
+    # The shared index is never modified; each award gets a copy with the like flag
+    grouped_awards = {}
     category_slugs = {}  # Dictionary to store category slugs
-
-    for award in award_years:
-        award["liked"] = (award["category__id"], award["year"]) in liked_award_set
-        grouped_awards[award["category__name"]].append(award)
-        category_slugs[award["category__name"]] = award[
-            "category__slug"
-        ]  # Store slug for each category
+    for category_name, (slug, awards) in get_award_year_index().items():
+        grouped_awards[category_name] = [
+            {**award, "liked": (award["category"], award["year"]) in liked_award_set}
+            for award in awards
+        ]
+        category_slugs[category_name] = slug
 
     context = {
-        "grouped_awards": dict(
-            grouped_awards
-        ),  # Convert defaultdict to a normal dictionary
+        "grouped_awards": grouped_awards,
         "category_slugs": category_slugs,  # Pass slugs to template
     }
     return render(request, "pages/award_year_list.html", context)
@@ -530,26 +504,23 @@ def toggle_award_year_like(request, category_id, year):
 
 @login_required
 def my_award_lists(request):
-    liked_awards = AwardYearLike.objects.filter(user=request.user)
+    list_progress = get_user_progress(request.user)
     liked_award_data = []
 
-    for like in liked_awards:
-        books = BookCategory.objects.filter(category=like.category, year=like.year)
-        user_books = UserBookCategory.objects.filter(
-            user=request.user, book_category__in=books
-        )
-
-        completed_books = user_books.filter(completed=True).select_related(
-            "book_category__book"
-        )
-        not_completed_books = books.exclude(
-            id__in=completed_books.values_list("book_category", flat=True)
-        )
-
+    for like, completed_books, not_completed_books in liked_lists_with_completion(
+        request.user
+    ):
+        progress = list_progress.get((like.category_id, like.year))
         liked_award_data.append(
             {
                 "category": like.category,
                 "year": like.year,
+                "completed_count": progress.completed_count if progress else 0,
+                "total_books": (
+                    progress.total_books
+                    if progress
+                    else len(completed_books) + len(not_completed_books)
+                ),
                 "completed_books": completed_books,
                 "not_completed_books": not_completed_books,
             }
@@ -561,15 +532,6 @@ def my_award_lists(request):
 
 @login_required
 def my_to_read_list(request):
-    liked_awards = AwardYearLike.objects.filter(user=request.user)
-    print("Liked awards:", liked_awards)
-    to_read_books = []
-
-    # Fetch IDs of books marked as completed for the user
-    user_completed_books = UserBook.objects.filter(
-        user=request.user, completed=True
-    ).values_list("book_id", flat=True)
-
     user = request.user
     favorite_library_ids = UserFavoriteLibrary.objects.filter(user=user).values_list(
         "library_id", flat=True
@@ -577,25 +539,8 @@ def my_to_read_list(request):
     favorite_libraries = Library.objects.filter(id__in=favorite_library_ids)
     non_favorite_libraries = Library.objects.exclude(id__in=favorite_library_ids)
 
-    # Debugging
-    print("Completed book IDs:", list(user_completed_books))
-
-    for like in liked_awards:
-        # Get all BookCategory entries for the liked category and year
-        books = BookCategory.objects.filter(category=like.category, year=like.year)
-
-        # Exclude completed books
-        unread_books = books.exclude(book_id__in=user_completed_books)
-        to_read_books.extend(unread_books)
-        to_read_books
-
-    to_read_books = sorted(
-        to_read_books,
-        key=lambda book: book.book.author.last_name.lower() if book.book.author else "",
-    )
-
     context = {
-        "to_read_books": to_read_books,
+        "to_read_books": list(to_read_books(user)),
         "favorite_libraries": favorite_libraries,
         "non_favorite_libraries": non_favorite_libraries,
     }
@@ -604,42 +549,23 @@ def my_to_read_list(request):
 
 def get_unique_books_per_branch(request, library_id):
     # Get the list of book bibliocommons IDs from the query string
-    book_ids = request.GET.get("books", "").split(",")
-    base_url = f"https://gateway.bibliocommons.com/v2/libraries/{library_id}/bibs/"
-    url_suffix = "/availability?locale=en-US"
-    #examle url: https://gateway.bibliocommons.com/v2/libraries/hclib/bibs/S109C5966261/availability?locale=en-US
+    book_ids = [book_id for book_id in request.GET.get("books", "").split(",") if book_id]
 
     # Initialize branch data
     branch_unique_books = defaultdict(set)
     book_additional_data = {}
 
-    # Process each query
-    for book_id in book_ids:
-        url = f"{base_url}{book_id}{url_suffix}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-
-            # Iterate over bibItems to filter and collect data
-            for item_id, item_data in (
-                data.get("entities", {}).get("bibItems", {}).items()
-            ):
-                availability = item_data.get("availability", {})
-                if availability.get("statusType") == "AVAILABLE":
-                    branch_name = item_data.get("branchName", "Unknown")
-                    branch_unique_books[branch_name].add(book_id)
-
-                    # Store additional data for the book
-                    book_additional_data[book_id] = {
-                        "collection": item_data.get("collection", "Unknown Collection"),
-                        "callNumber": item_data.get(
-                            "callNumber", "Unknown Call Number"
-                        ),
-                    }
+    # Fetch every book's availability concurrently; failed lookups are skipped
+    availability = get_availability_client().fetch_many(library_id, book_ids)
+    for book_id, items in availability.items():
+        for item in items:
+            branch_unique_books[item["branchName"]].add(book_id)
 
-        except Exception as e:
-            print(f"Error fetching data from {url}: {e}")
+            # Store additional data for the book
+            book_additional_data[book_id] = {
+                "collection": item["collection"],
+                "callNumber": item["callNumber"],
+            }
 
     # Fetch book details from the database
     books = {
@@ -650,7 +576,9 @@ def get_unique_books_per_branch(request, library_id):
             "slug": book.slug,
             "image": book.image if book.image else None,
         }
-        for book in Book.objects.filter(bibliocommons_id__in=book_ids)
+        for book in Book.objects.filter(bibliocommons_id__in=book_ids).select_related(
+            "author"
+        )
     }
 
     # Convert branch data to a sorted list
@@ -824,110 +752,16 @@ def scrape_view(request):
 
 @login_required
 def xp_report(request):
-    user = request.user
-    NEAR_COMPLETION_THRESHOLD = 0.3  # 30%
-    # Count the number of completed books
-    completed_books_count = UserBook.objects.filter(user=user, completed=True).count()
-    # Sum the page counts of completed books
-    completed_books_pages = (
-        UserBook.objects.filter(user=user, completed=True)
-        .select_related("book")
-        .aggregate(total_pages=Sum("book__page_count"))["total_pages"]
-    ) or 0
-    # Get the user's liked award years
-    liked_award_years = set(
-        AwardYearLike.objects.filter(user=user).values_list("category_id", "year")
-    )
-    # Initialize lists for different completion states
-    completed_lists = []  # New list for completed awards
-    near_complete_lists = []
-    discoverable_lists = []  # For lists user hasn't liked yet
-    # Get all award categories and years with their book counts
-    award_list_data = BookCategory.objects.values("category", "year").annotate(
-        total_books=Count("book")
-    )
-    # Get user's completed books
-    user_completed_books = set(
-        UserBook.objects.filter(user=user, completed=True).values_list(
-            "book_id", flat=True
-        )
-    )
-    # Get category information including slugs
-    categories_info = {
-        cat["id"]: {"name": cat["name"], "slug": cat["slug"]}
-        for cat in Category.objects.values("id", "name", "slug")
-    }
-    # For each award list
-    for award_list in award_list_data:
-        category_id = award_list["category"]
-        year = award_list["year"]
-        total_books = award_list["total_books"]
-        # Get all books in this category/year
-        books_in_list = set(
-            BookCategory.objects.filter(category_id=category_id, year=year).values_list(
-                "book_id", flat=True
-            )
-        )
-        # Check completion status
-        completed_books_in_list = books_in_list & user_completed_books
-        completion_ratio = len(completed_books_in_list) / total_books
-        # Skip if completion ratio is too low
-        if completion_ratio < NEAR_COMPLETION_THRESHOLD:
-            continue
-        # Prepare list data
-        list_data = {
-            "category": categories_info[category_id]["name"],
-            "category_slug": categories_info[category_id]["slug"],
-            "year": year,
-            "completed_count": len(completed_books_in_list),
-            "total_books": total_books,
-            "completion_percentage": round(completion_ratio * 100, 1),
-        }
-        # Add to appropriate list based on whether it's liked and completion status
-        if (category_id, year) in liked_award_years:
-            if completion_ratio == 1.0:
-                completed_lists.append(list_data)
-            else:
-                near_complete_lists.append(list_data)
-        else:
-            discoverable_lists.append(list_data)
-    # Sort all lists by completion percentage (highest first)
-    completed_lists.sort(
-        key=lambda x: x["year"], reverse=True
-    )  # Sort completed by year
-    near_complete_lists.sort(key=lambda x: x["completion_percentage"], reverse=True)
-    discoverable_lists.sort(key=lambda x: x["completion_percentage"], reverse=True)
-    # Calculate total points
-    points_from_pages = completed_books_pages
-    points_from_books = completed_books_count * 100
-    points_from_awards = (
-        len(completed_lists) * 500
-    )  # Updated to use length of completed_lists
-    total_points = points_from_pages + points_from_books + points_from_awards
-    context = {
-        "completed_books_count": completed_books_count,
-        "completed_books_pages": completed_books_pages,
-        "completed_lists": completed_lists,  # Add completed lists to context
-        "near_complete_lists": near_complete_lists,
-        "discoverable_lists": discoverable_lists,
-        "points_from_pages": points_from_pages,
-        "points_from_books": points_from_books,
-        "points_from_awards": points_from_awards,
-        "total_points": total_points,
-    }
+    context = xp_report_for_user(request.user)
     return render(request, "pages/user_report.html", context)
 
 
-def normalize_text(text):
-    """Normalize text by converting to lowercase and removing diacritics."""
-    return unidecode(text.strip().lower())
-
-
-
 def search_view(request):
     query = request.GET.get("q", "")
+    # Substring matches on the normalized name, so "pena" finds "Peña"
+    normalized_query = normalize_search_key(query)
 
-    if not query:
+    if not normalized_query:
         return render(
             request,
             "pages/search/search_results.html",
@@ -939,22 +773,11 @@ def search_view(request):
             },
         )
 
-    authors = Author.objects.filter(
-        Q(first_name__icontains=query) | Q(last_name__icontains=query)
-    ).distinct()
+    people_filter = Q(name_normalized__contains=normalized_query)
+    authors = Author.objects.filter(people_filter)
+    illustrators = Illustrator.objects.filter(people_filter)
 
-    illustrators = Illustrator.objects.filter(
-        Q(first_name__icontains=query) | Q(last_name__icontains=query)
-    ).distinct()
-
-    books = Book.objects.filter(
-        Q(title__icontains=query)
-        | Q(author__first_name__icontains=query)
-        | Q(author__last_name__icontains=query)
-        | Q(illustrator__first_name__icontains=query)
-        | Q(illustrator__last_name__icontains=query)
-        | Q(isbn__icontains=query)
-    ).distinct()
+    books = search_books(query)
 
     # Paginate books
     page_number = int(request.GET.get("page", 1))
@@ -979,7 +802,7 @@ def search_view(request):
             "authors": authors,
             "illustrators": illustrators,
             "books": books_page,
-            "total_books": books.count(),
+            "total_books": books_paginator.count,
         },
     )
 
@@ -991,22 +814,8 @@ def search_autocomplete(request):
             request, "pages/search/partials/autocomplete_results.html", {"results": []}
         )
 
-    authors = Author.objects.filter(
-        Q(first_name__icontains=query) | Q(last_name__icontains=query)
-    )[:5]
-
-    illustrators = Illustrator.objects.filter(
-        Q(first_name__icontains=query) | Q(last_name__icontains=query)
-    )[:5]
-
-    books = Book.objects.filter(Q(title__icontains=query))[:5]
-
-    results = {
-        "authors": authors,
-        "illustrators": illustrators,
-        "books": books,
-        "query": query,
-    }
+    results = get_autocomplete_index().suggest(query)
+    results["query"] = query
 
     return render(request, "pages/search/partials/autocomplete_results.html", results)
 
@@ -1218,155 +1027,113 @@ def update_book_from_api(request, pk):
     return HttpResponse("Invalid request", status=400)
 
 
+PEOPLE_KINDS = {"authors": Author, "illustrators": Illustrator}
+
+
+def _people_model(kind):
+    return PEOPLE_KINDS.get(kind, Author)
+
+
 class AuthorListView(LoginRequiredMixin, View):
     def get(self, request):
-        # Find first names that appear more than once
-        duplicate_first_names = Author.objects.values('first_name').annotate(
-            count=Count('first_name')
-        ).filter(count__gt=1).values_list('first_name', flat=True)
-        # Find last names that appear more than once
-        duplicate_last_names = Author.objects.values('last_name').annotate(
-            count=Count('last_name')
-        ).filter(count__gt=1).values_list('last_name', flat=True)
-        # Filter authors to only include those with duplicate first OR last names
-        authors = Author.objects.filter(
-            Q(first_name__in=duplicate_first_names) |
-            Q(last_name__in=duplicate_last_names)
-        ).order_by('last_name', 'first_name')
-
-        # Convert to list and add highlighting flag for consecutive same first names
-        authors_list = list(authors)
-        for i, author in enumerate(authors_list):
-            if i > 0 and author.first_name == authors_list[i-1].first_name:
-                author.highlight_consecutive = True
-            else:
-                author.highlight_consecutive = False
-
-        return render(request, 'pages/authors/author_list.html', {'authors': authors_list})
+        kind = request.GET.get("kind", "authors")
+        # Clusters of likely duplicates by fuzzy match on normalized names
+        clusters = load_duplicate_clusters(_people_model(kind))
+        return render(
+            request,
+            'pages/authors/author_list.html',
+            {'clusters': clusters, 'kind': kind if kind in PEOPLE_KINDS else "authors"},
+        )
 
 
-class AuthorConsolidateView(View):
-    @transaction.atomic
+class AuthorConsolidateView(LoginRequiredMixin, View):
     def post(self, request):
-        primary_author_id = request.POST.get('primary_author')
-        secondary_author_id = request.POST.get('secondary_author')
+        kind = request.POST.get('kind', 'authors')
+        model = _people_model(kind)
+        redirect_url = f"{reverse('author_list')}?kind={kind}"
+        try:
+            primary_id = int(request.POST.get('primary_author', ''))
+            secondary_ids = {
+                int(pk) for pk in request.POST.getlist('secondary_author')
+            } - {primary_id}
+        except ValueError:
+            primary_id, secondary_ids = None, set()
 
         # Validate inputs
-        if not primary_author_id or not secondary_author_id:
-            messages.error(request, "Both primary and secondary authors must be selected.")
-            return redirect('author_list')
+        if not primary_id or not secondary_ids:
+            messages.error(request, "Select one record to keep and at least one to merge into it.")
+            return redirect(redirect_url)
 
-        if primary_author_id == secondary_author_id:
-            messages.error(request, "Primary and secondary authors must be different.")
-            return redirect('author_list')
+        people = model.objects.in_bulk([primary_id, *secondary_ids])
+        primary = people.get(primary_id)
+        duplicates = [person for pk, person in people.items() if pk in secondary_ids]
+        if primary is None or len(duplicates) != len(secondary_ids):
+            messages.error(request, "One or more of the selected records do not exist.")
+            return redirect(redirect_url)
 
-        # Get author objects
-        try:
-            primary_author = Author.objects.get(pk=primary_author_id)
-            secondary_author = Author.objects.get(pk=secondary_author_id)
-        except Author.DoesNotExist:
-            messages.error(request, "One or both of the selected authors do not exist.")
-            return redirect('author_list')
-
-        # Get all books by the secondary author
-        secondary_books = Book.objects.filter(author=secondary_author)
-
-        # Update all books to use the primary author
-        for book in secondary_books:
-            book.author = primary_author
-            book.save()
-
-        # Delete the secondary author
-        secondary_author.delete()
+        moved = merge_people(model, primary, duplicates)
 
         messages.success(
             request,
-            f"Successfully consolidated {secondary_author} into {primary_author}. "
-            f"{secondary_books.count()} books were updated."
+            f"Successfully consolidated {', '.join(str(person) for person in duplicates)} "
+            f"into {primary}. {moved} books were updated."
         )
 
-        return redirect('author_list')
+        return redirect(redirect_url)
 
+@login_required
 def upload_book_categories(request):
     if request.method == "POST" and request.FILES.get("csv_file"):
-        csv_file = request.FILES["csv_file"]
-        try:
-            # First, validate the file and get row count
-            validation_result = validate_upload_file(csv_file)
-            if not validation_result['is_valid']:
-                for error in validation_result['errors']:
-                    messages.error(request, error)
-                return render(request, "pages/upload_book_categories.html")
-
-            total_rows = validation_result['total_rows']
-            messages.info(request, f"File validated successfully. Processing {total_rows} records...")
-
-            # Reset file pointer after validation
-            csv_file.seek(0)
-
-            # Process in batches to avoid timeout
-            batch_size = 100  # Adjust based on your server capacity
-            processed_count = 0
-            error_count = 0
-
-            # Pre-load existing data to reduce database queries
-            existing_books_cache = cache_existing_books()
-            existing_authors_cache = cache_existing_authors()
-            existing_illustrators_cache = cache_existing_illustrators()
-            categories_cache = {cat.id: cat for cat in Category.objects.all()}
-            award_levels_cache = {level.id: level for level in AwardLevel.objects.all()}
-
-            # Decode file once
-            decoded_file = csv_file.read().decode("utf-8-sig").splitlines()
-            reader = csv.DictReader(decoded_file, delimiter="\t")
-
-            # Process in batches
-            batch = []
-            for row_num, row in enumerate(reader, 1):
-                batch.append((row_num, row))
-
-                if len(batch) >= batch_size:
-                    success, errors = process_batch(
-                        batch, existing_books_cache, existing_authors_cache,
-                        existing_illustrators_cache, categories_cache, award_levels_cache
-                    )
-                    processed_count += success
-                    error_count += errors
-                    batch = []
-
-                    # Optional: Add progress message for very large uploads
-                    if row_num % 500 == 0:
-                        messages.info(request, f"Processed {row_num} of {total_rows} records...")
-
-            # Process remaining batch
-            if batch:
-                success, errors = process_batch(
-                    batch, existing_books_cache, existing_authors_cache,
-                    existing_illustrators_cache, categories_cache, award_levels_cache
-                )
-                processed_count += success
-                error_count += errors
+        # The worker (manage.py run_import_jobs) validates and imports the file
+        job = enqueue_import(request.FILES["csv_file"], request.user)
+        return redirect("import_job_detail", job_id=job.id)
 
-            # Clear caches after processing
-            cache.delete_many(['existing_books', 'existing_authors', 'existing_illustrators'])
+    return render(request, "pages/upload_book_categories.html", {
+        "recent_jobs": ImportJob.objects.filter(user=request.user)[:10],
+    })
 
-            if error_count > 0:
-                messages.warning(
-                    request,
-                    f"Upload completed with {error_count} errors. {processed_count} records processed successfully."
-                )
-            else:
-                messages.success(
-                    request,
-                    f"Book categories uploaded successfully! {processed_count} records processed."
-                )
 
-            return redirect("upload_book_categories")
+def _get_import_job(request, job_id):
+    job = get_object_or_404(ImportJob, id=job_id)
+    if job.user_id != request.user.id and not request.user.is_staff:
+        raise Http404("Import job not found")
+    return job
+
+
+@login_required
+def import_job_detail(request, job_id):
+    return render(request, "pages/import_job_detail.html", {
+        "job": _get_import_job(request, job_id),
+    })
 
-        except Exception as e:
-            messages.error(request, f"Error processing file: {str(e)}")
 
-    return render(request, "pages/upload_book_categories.html")
+@login_required
+def import_job_progress(request, job_id):
+    """Progress fragment polled by htmx until the job finishes"""
+    return render(request, "pages/partials/import_job_progress.html", {
+        "job": _get_import_job(request, job_id),
+    })
+
+
+class _Echo:
+    """A write-only file that hands each written line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+@login_required
+def import_job_errors(request, job_id):
+    """Download every row error of an import as a TSV report"""
+    job = _get_import_job(request, job_id)
+    writer = csv.writer(_Echo(), delimiter="\t")
+    rows = job.row_errors.values_list("row", "column", "reason").iterator()
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in chain([("row", "column", "reason")], rows)),
+        content_type="text/tab-separated-values",
+    )
+    response["Content-Disposition"] = f'attachment; filename="import-{job.id}-errors.tsv"'
+    return response
 
 
 '''Update books using amazon api'''
@@ -1415,29 +1182,14 @@ def bulk_enrich_books_view(request):
         limit = int(request.POST.get('limit', 10))
 
         try:
-            api_key = getattr(settings, 'ASINDATAAPI', None)
-            amazon_matcher = AmazonBookMatcher(api_key)
-            enricher = BookDataEnricher(amazon_matcher)
-
-            books = get_books_needing_enrichment()[:limit]
-            processed = 0
-            updated = 0
-
-            for book in books:
-                try:
-                    if enricher.enrich_book(book):
-                        updated += 1
-                    processed += 1
-                    time.sleep(1)  # Rate limiting
-                except Exception as e:
-                    print(f"Error processing {book.title}: {e}")
-                    processed += 1
+            pipeline = BookEnrichmentPipeline.from_settings()
+            counts = pipeline.run(get_books_needing_enrichment()[:limit])
 
             return JsonResponse({
                 'success': True,
-                'processed': processed,
-                'updated': updated,
-                'message': f'Processed {processed} books, updated {updated}'
+                'processed': counts['processed'],
+                'updated': counts['updated'],
+                'message': f"Processed {counts['processed']} books, updated {counts['updated']}"
             })
 
         except Exception as e: